@@ -1,3 +1,13 @@
 from edge_impulse_linux import runner
 from edge_impulse_linux import audio
 from edge_impulse_linux import image
+from edge_impulse_linux import pool
+from edge_impulse_linux import frame_pool
+from edge_impulse_linux import detections
+from edge_impulse_linux import preview
+from edge_impulse_linux import shm
+from edge_impulse_linux import anomaly
+from edge_impulse_linux import remote
+from edge_impulse_linux import governor
+from edge_impulse_linux import cascade
+from edge_impulse_linux import multi
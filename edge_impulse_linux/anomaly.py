@@ -0,0 +1,158 @@
+import numpy as np
+import cv2
+from edge_impulse_linux.image import fit_shortest_crop, letterbox_geometry
+
+
+def grid_to_array(grid):
+    """Convert a visual_anomaly_grid (list of cells) to an (N, 5) float32 array of x, y, width, height, value."""
+    if not grid:
+        return np.zeros((0, 5), dtype=np.float32)
+    return np.array([(c['x'], c['y'], c['width'], c['height'], c['value']) for c in grid], dtype=np.float32)
+
+
+def anomaly_threshold(model_info, default=0.0):
+    """The minimum anomaly score the model was deployed with (model_parameters.thresholds),
+    or default when the model file doesn't report one."""
+    for threshold in model_info.get('model_parameters', {}).get('thresholds', []):
+        if threshold.get('type', '').startswith('anomaly') and 'min_anomaly_score' in threshold:
+            return float(threshold['min_anomaly_score'])
+    return default
+
+
+def grid_to_heatmap(grid, input_width, input_height):
+    """Render a visual anomaly grid into a (input_height, input_width) float32 heatmap.
+
+    Args:
+        grid: The visual_anomaly_grid from a runner response, or an array from grid_to_array().
+        input_width (int): Model input width.
+        input_height (int): Model input height.
+
+    Returns:
+        numpy.ndarray: The anomaly score of every input pixel (0 where there is no cell).
+    """
+    cells = grid if isinstance(grid, np.ndarray) else grid_to_array(grid)
+    heatmap = np.zeros((input_height, input_width), dtype=np.float32)
+    if len(cells) == 0:
+        return heatmap
+
+    xywh = cells[:, :4].astype(np.int32)
+    values = cells[:, 4]
+    cell_w, cell_h = xywh[0, 2], xywh[0, 3]
+    uniform = (np.all(xywh[:, 2] == cell_w) and np.all(xywh[:, 3] == cell_h) and cell_w > 0 and cell_h > 0
+               and np.all(xywh[:, 0] % cell_w == 0) and np.all(xywh[:, 1] % cell_h == 0))
+
+    if uniform:
+        # regular grid: scatter the scores into a (rows, cols) array, then blow that up in one go
+        cols = -(-input_width // cell_w)
+        rows = -(-input_height // cell_h)
+        small = np.zeros((rows, cols), dtype=np.float32)
+        np.maximum.at(small, (np.minimum(xywh[:, 1] // cell_h, rows - 1), np.minimum(xywh[:, 0] // cell_w, cols - 1)), values)
+        heatmap[:] = np.repeat(np.repeat(small, cell_h, axis=0), cell_w, axis=1)[:input_height, :input_width]
+    else:
+        for (x, y, w, h), value in zip(xywh.tolist(), values.tolist()):
+            region = heatmap[y:y + h, x:x + w]
+            np.maximum(region, value, out=region)
+    return heatmap
+
+
+def heatmap_to_frame(heatmap, frame_width, frame_height, mode):
+    """Map a heatmap in model input coordinates back onto the original frame.
+
+    Args:
+        heatmap (numpy.ndarray): (input_height, input_width) heatmap from grid_to_heatmap().
+        frame_width (int): Width of the frame that was passed to the studio preprocessing.
+        frame_height (int): Height of that frame.
+        mode (str): The studio resize mode, 'fit-shortest', 'fit-longest' or 'squash'.
+
+    Returns:
+        numpy.ndarray: (frame_height, frame_width) heatmap, 0 outside the region the model saw.
+    """
+    input_height, input_width = heatmap.shape[:2]
+    if mode == 'squash':
+        return cv2.resize(heatmap, (frame_width, frame_height), interpolation=cv2.INTER_NEAREST)
+    if mode == 'fit-shortest':
+        x, y, w, h = fit_shortest_crop(frame_width, frame_height, input_width, input_height)
+        out = np.zeros((frame_height, frame_width), dtype=heatmap.dtype)
+        out[y:y + h, x:x + w] = cv2.resize(heatmap, (w, h), interpolation=cv2.INTER_NEAREST)
+        return out
+    if mode == 'fit-longest':
+        new_width, new_height, top, _, left, _ = letterbox_geometry(frame_width, frame_height, input_width, input_height)
+        inner = heatmap[top:top + new_height, left:left + new_width]
+        return cv2.resize(inner, (frame_width, frame_height), interpolation=cv2.INTER_NEAREST)
+    raise ValueError(f"Unsupported mode: {mode}")
+
+
+def boxes_to_frame(boxes, frame_width, frame_height, mode, input_width, input_height):
+    """Map (N, 4) x, y, width, height boxes from model input coordinates to the original frame.
+
+    Returns:
+        numpy.ndarray: int32 boxes in frame coordinates, clipped to the frame.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if mode == 'squash':
+        scale_x, scale_y = frame_width / input_width, frame_height / input_height
+        offset_x = offset_y = 0
+    elif mode == 'fit-shortest':
+        offset_x, offset_y, w, h = fit_shortest_crop(frame_width, frame_height, input_width, input_height)
+        scale_x, scale_y = w / input_width, h / input_height
+    elif mode == 'fit-longest':
+        new_width, new_height, top, _, left, _ = letterbox_geometry(frame_width, frame_height, input_width, input_height)
+        scale_x, scale_y = frame_width / new_width, frame_height / new_height
+        offset_x, offset_y = -left * scale_x, -top * scale_y
+    else:
+        raise ValueError(f"Unsupported mode: {mode}")
+
+    out = np.empty_like(boxes)
+    out[:, 0] = boxes[:, 0] * scale_x + offset_x
+    out[:, 1] = boxes[:, 1] * scale_y + offset_y
+    out[:, 2] = boxes[:, 2] * scale_x
+    out[:, 3] = boxes[:, 3] * scale_y
+    out = np.rint(out).astype(np.int32)
+    x2 = np.clip(out[:, 0] + out[:, 2], 0, frame_width)
+    y2 = np.clip(out[:, 1] + out[:, 3], 0, frame_height)
+    np.clip(out[:, 0], 0, frame_width, out=out[:, 0])
+    np.clip(out[:, 1], 0, frame_height, out=out[:, 1])
+    out[:, 2] = x2 - out[:, 0]
+    out[:, 3] = y2 - out[:, 1]
+    return out
+
+
+def anomaly_boxes(heatmap, threshold):
+    """Merge touching above-threshold pixels of a heatmap into anomaly boxes.
+
+    Returns:
+        tuple: (boxes, scores) where boxes is an (N, 4) int32 array of x, y, width, height
+            and scores the maximum score inside each box.
+    """
+    mask = (heatmap > threshold).astype(np.uint8)
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if count <= 1:
+        return np.zeros((0, 4), dtype=np.int32), np.zeros(0, dtype=np.float32)
+
+    scores = np.zeros(count, dtype=np.float32)
+    selected = mask.astype(bool)
+    np.maximum.at(scores, labels[selected], heatmap[selected])
+    # label 0 is the background
+    return stats[1:, :4].astype(np.int32), scores[1:]
+
+
+def overlay_heatmap(img, heatmap, threshold=None, max_value=None, alpha=0.4):
+    """Blend a colour-mapped heatmap over img in place (same height/width), only where it's above threshold.
+
+    Colours go from blue (threshold or 0) to red (max_value, defaults to the heatmap maximum).
+    img is treated as RGB when it has 3 channels.
+    """
+    low = 0.0 if threshold is None else threshold
+    high = float(heatmap.max()) if max_value is None else max_value
+    scale = 255.0 / (high - low) if high > low else 0.0
+    levels = np.clip((heatmap - low) * scale, 0, 255).astype(np.uint8)
+    colors = cv2.applyColorMap(levels, cv2.COLORMAP_JET)
+    if img.ndim == 3:
+        colors = cv2.cvtColor(colors, cv2.COLOR_BGR2RGB)
+
+    blended = cv2.addWeighted(img, 1.0 - alpha, colors if img.ndim == 3 else levels, alpha, 0)
+    if threshold is None:
+        np.copyto(img, blended)
+    else:
+        np.copyto(img, blended, where=(heatmap > threshold)[..., None] if img.ndim == 3 else heatmap > threshold)
+    return img
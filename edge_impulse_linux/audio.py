@@ -1,18 +1,110 @@
 
 import numpy as np
 import pyaudio
+import os
+import struct
+import subprocess
 import time
-from six.moves import queue
+import threading
 from edge_impulse_linux.runner import ImpulseRunner as ImpulseRunner
 CHUNK_SIZE = 1024
 OVERLAP = 0.25
 
+# What to do when classification falls behind the live audio
+LAG_POLICY_ALL = 'all'            # classify every window, latency may grow
+LAG_POLICY_NEWEST = 'newest'      # skip straight to the newest full window
+LAG_POLICY_ADAPTIVE = 'adaptive'  # grow the stride while lagging, shrink it back after
+LAG_POLICIES = (LAG_POLICY_ALL, LAG_POLICY_NEWEST, LAG_POLICY_ADAPTIVE)
+
+# What to do when the capture queue is full
+DROP_OLDEST = 'drop-oldest'
+DROP_NEWEST = 'drop-newest'
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST)
+QUEUE_CHUNKS = 64
+
 def now():
     return round(time.time() * 1000)
 
+class ChunkQueue():
+    """Bounded queue of preallocated audio chunks.
+
+    put() copies into a free slot and never allocates, so it is safe to call from the
+    real-time audio callback. When all slots are taken a chunk is dropped according to
+    drop_policy and the overflow counters are updated.
+    """
+    def __init__(self, slots, slot_size, drop_policy = DROP_OLDEST):
+        if drop_policy not in DROP_POLICIES:
+            raise Exception('Invalid drop_policy "' + str(drop_policy) + '", should be one of ' + ', '.join(DROP_POLICIES))
+        if slots <= 0:
+            raise Exception('A chunk queue needs at least one slot')
+
+        self.drop_policy = drop_policy
+        self._slots = [bytearray(slot_size) for _ in range(slots)]
+        self._views = [memoryview(slot) for slot in self._slots]
+        self._lengths = [0] * slots
+        self._head = 0
+        self._count = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.overflows = 0
+        self.dropped_bytes = 0
+
+    def __len__(self):
+        return self._count
+
+    def put(self, data):
+        n = len(data)
+        with self._cond:
+            if self._closed:
+                return False
+            if self._count == len(self._slots):
+                self.overflows += 1
+                self.dropped_bytes += n if self.drop_policy == DROP_NEWEST else self._lengths[self._head]
+                if self.drop_policy == DROP_NEWEST:
+                    return False
+                self._head = (self._head + 1) % len(self._slots)
+                self._count -= 1
+
+            ix = (self._head + self._count) % len(self._slots)
+            if n > len(self._slots[ix]):
+                # only happens if the driver hands over more frames than requested
+                self._slots[ix] = bytearray(n)
+                self._views[ix] = memoryview(self._slots[ix])
+            self._views[ix][:n] = data
+            self._lengths[ix] = n
+            self._count += 1
+            self._cond.notify()
+            return True
+
+    def get_all(self, timeout = None):
+        """Block until data is available and return all queued chunks joined together.
+
+        Returns None once the queue is closed and empty, or b'' on timeout.
+        """
+        with self._cond:
+            while self._count == 0:
+                if self._closed:
+                    return None
+                if not self._cond.wait(timeout):
+                    return b''
+
+            data = []
+            while self._count > 0:
+                data.append(self._views[self._head][:self._lengths[self._head]])
+                self._head = (self._head + 1) % len(self._slots)
+                self._count -= 1
+            return b''.join(data)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
 class Microphone():
-    def __init__(self, rate, chunk_size, device_id = None, channels = 1):
-        self.buff = queue.Queue()
+    def __init__(self, rate, chunk_size, device_id = None, channels = 1,
+                 max_queue_chunks = QUEUE_CHUNKS, drop_policy = DROP_OLDEST, interactive = True):
+        self.buff = ChunkQueue(max_queue_chunks, chunk_size * 2 * channels, drop_policy)
+        self._zeros = bytes(chunk_size * 2 * channels)
         self.chunk_size = chunk_size
         self.data = []
         self.rate = rate
@@ -22,6 +114,14 @@ class Microphone():
         self.device_id = device_id
         self.zero_counter = 0
 
+        if not interactive:
+            # only pick a device when none was asked for, never swap out an explicit choice
+            if self.device_id == None:
+                self.device_id = self.findCompatibleDevice()
+            elif not self.checkDeviceModelCompatibility(self.device_id):
+                raise Exception('Audio device ' + str(self.device_id) + ' is not compatible with this model (' +
+                                str(self.rate) + ' Hz, ' + str(self.channels) + ' channel(s), 16-bit)')
+
         while self.device_id == None or not self.checkDeviceModelCompatibility(self.device_id):
             input_devices = self.listAvailableDevices()
             input_device_id = int(input("Type the id of the audio device you want to use: \n"))
@@ -48,6 +148,14 @@ class Microphone():
 
 
 
+    def findCompatibleDevice(self):
+        info = self.interface.get_host_api_info_by_index(0)
+        for i in range (0, info.get('deviceCount')):
+            if self.interface.get_device_info_by_host_api_device_index(0,i).get('maxInputChannels')>0:
+                if self.checkDeviceModelCompatibility(i):
+                    return i
+        raise Exception('There are no audio devices compatible with this model')
+
     def listAvailableDevices(self):
         if not self.interface:
             self.interface = pyaudio.PyAudio()
@@ -87,17 +195,19 @@ class Microphone():
         self.stream.stop_stream()
         self.stream.close()
         self.closed = True
+        self.buff.close()
         self.interface.terminate()
 
     def fill_buffer(self, in_data, frame_count, time_info, status_flags):
-        zeros=bytes(self.chunk_size*2)
-        if in_data != zeros:
+        # bytes == bytes is a plain memcmp, no allocation on the audio thread
+        if in_data != self._zeros:
             self.zero_counter = 0
         else:
             self.zero_counter+=1
 
         if self.zero_counter > self.rate / self.chunk_size:
             self.closed = True
+            self.buff.close()
             raise Exception('There is no audio data comming from the audio interface')
 
         self.buff.put(in_data)
@@ -105,22 +215,187 @@ class Microphone():
 
     def generator(self):
         while not self.closed:
-            chunk = self.buff.get()
+            data = self.buff.get_all()
+
+            if data is None:
+                return
+
+            yield data
+
+class PcmSource():
+    """Raw interleaved int16 PCM read from a file, FIFO or file descriptor.
+
+    Reads go straight into one preallocated buffer with readinto(). The chunks yielded
+    by generator() are views on that buffer and are only valid until the next chunk.
+    """
+    def __init__(self, file, rate, channels = 1, chunk_size = CHUNK_SIZE):
+        self.rate = rate
+        self.channels = channels
+        self.chunk_size = chunk_size
+        self.closed = True
+        self._target = file
+        self._file = None
+        self._buffer = bytearray(chunk_size * 2 * channels)
+
+    def _open(self):
+        if isinstance(self._target, int):
+            return os.fdopen(self._target, 'rb', buffering=0, closefd=False)
+        if isinstance(self._target, str):
+            return open(self._target, 'rb', buffering=0)
+        return self._target
+
+    def __enter__(self):
+        self._file = self._open()
+        self.closed = False
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.closed = True
+        if self._file is not self._target:
+            self._file.close()
+
+    def generator(self):
+        view = memoryview(self._buffer)
+        frame_bytes = 2 * self.channels
+        pending = 0
+        while not self.closed:
+            n = self._file.readinto(view[pending:])
+            if not n:
+                return
+            pending += n
+            usable = pending - pending % frame_bytes
+            if usable == 0:
+                continue
+
+            yield view[:usable]
+
+            # keep a partial frame around for the next read
+            leftover = pending - usable
+            view[:leftover] = view[usable:pending]
+            pending = leftover
+
+class ArecordSource(PcmSource):
+    """Raw PCM captured by an `arecord` subprocess (ALSA), without going through PortAudio."""
+    def __init__(self, rate, channels = 1, chunk_size = CHUNK_SIZE, device = None):
+        super(ArecordSource, self).__init__(None, rate, channels, chunk_size)
+        self.device = device
+        self._process = None
+
+    def _open(self):
+        cmd = ['arecord', '-q', '-t', 'raw', '-f', 'S16_LE', '-r', str(self.rate), '-c', str(self.channels)]
+        if self.device:
+            cmd += ['-D', self.device]
+        self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, bufsize=0)
+        return self._process.stdout
+
+    def __exit__(self, type, value, traceback):
+        super(ArecordSource, self).__exit__(type, value, traceback)
+        if self._process:
+            self._process.terminate()
+            self._process.wait()
+            self._process = None
+
+class GeneratorSource():
+    """In-memory audio source, yields the given chunks (bytes or int16 arrays) as they are."""
+    def __init__(self, chunks, rate, channels = 1):
+        self.rate = rate
+        self.channels = channels
+        self.closed = True
+        self._chunks = chunks
 
-            if chunk is None:
+    def __enter__(self):
+        self.closed = False
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.closed = True
+
+    def generator(self):
+        for chunk in self._chunks:
+            if self.closed:
                 return
+            if isinstance(chunk, np.ndarray):
+                chunk = chunk.astype(np.int16, copy=False).tobytes()
+            yield chunk
+
+def read_audio_file(path, pcm_rate = None, pcm_channels = 1, channel = 0):
+    """Memory-map a 16-bit WAV or raw PCM file.
+
+    Args:
+        path: Path to a .wav file, or a raw little-endian int16 PCM file.
+        pcm_rate: Sample rate of a raw PCM file (ignored for WAV files).
+        pcm_channels: Number of interleaved channels in a raw PCM file.
+        channel: Which channel to return for multi-channel files.
+
+    Returns:
+        A tuple (samples, rate) where samples is a read-only int16 view on the file.
+    """
+    data_offset = 0
+    data_size = os.path.getsize(path)
+    rate = pcm_rate
+    channels = pcm_channels
 
-            data = [chunk]
+    with open(path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) == 12 and riff[0:4] == b'RIFF' and riff[8:12] == b'WAVE':
+            data_offset = None
             while True:
-                try:
-                    chunk = self.buff.get(block=False)
-                    if chunk is None:
-                        return
-                    data.append(chunk)
-                except queue.Empty:
+                header = f.read(8)
+                if len(header) < 8:
                     break
+                chunk_id, chunk_size = struct.unpack('<4sI', header)
+                if chunk_id == b'fmt ':
+                    fmt = f.read(chunk_size + (chunk_size & 1))
+                    audio_format, channels, rate, _, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+                    # 1 = PCM, 0xfffe = WAVE_FORMAT_EXTENSIBLE
+                    if audio_format not in (1, 0xfffe) or bits != 16:
+                        raise Exception('WAV file "' + path + '" is not 16-bit PCM')
+                elif chunk_id == b'data':
+                    data_offset = f.tell()
+                    # streamed WAV files may leave the size at 0 or 0xffffffff
+                    data_size = min(chunk_size, os.path.getsize(path) - data_offset) or os.path.getsize(path) - data_offset
+                    break
+                else:
+                    f.seek(chunk_size + (chunk_size & 1), 1)
+            if data_offset is None:
+                raise Exception('WAV file "' + path + '" has no data chunk')
+
+    if not rate:
+        raise Exception('Sample rate for raw PCM file "' + path + '" is unknown, pass pcm_rate')
+    if channel >= channels:
+        raise Exception('File "' + path + '" has ' + str(channels) + ' channel(s), channel ' + str(channel) + ' requested')
+
+    frames = data_size // (2 * channels)
+    if frames == 0:
+        return np.zeros(0, dtype=np.int16), rate
+
+    samples = np.memmap(path, dtype='<i2', mode='r', offset=data_offset, shape=(frames * channels,))
+    return samples[channel::channels], rate
+
+def file_windows(samples, rate, sampling_rate, window_size, stride):
+    """Yield (offset_ms, window) over samples, resampled from rate to sampling_rate.
 
-            yield b''.join(data)
+    Windows advance by stride samples (at sampling_rate), incomplete windows at the end
+    are dropped, same as classifier(). Resampling is linear and done per window, so
+    memory use doesn't depend on the length of the file.
+    """
+    ratio = rate / sampling_rate
+    total = int(len(samples) / ratio)
+    positions = np.arange(window_size, dtype=np.float64)
+
+    for offset in range(0, total - window_size + 1, stride):
+        if rate == sampling_rate:
+            window = samples[offset:offset + window_size]
+        else:
+            src = (positions + offset) * ratio
+            lo = int(src[0])
+            hi = min(int(src[-1]) + 2, len(samples))
+            window = np.interp(src, np.arange(lo, hi), samples[lo:hi]).round().astype(np.int16)
+        yield offset * 1000 / sampling_rate, window
+
+def window_rms(window):
+    """RMS level per channel of a (frames, channels) int16 window, without copying it to float."""
+    return np.sqrt(np.einsum('ij,ij->j', window, window, dtype=np.float64) / max(len(window), 1))
 
 class AudioImpulseRunner(ImpulseRunner):
     def __init__(self, model_path: str):
@@ -129,9 +404,10 @@ class AudioImpulseRunner(ImpulseRunner):
         self.sampling_rate = 0
         self.window_size = 0
         self.labels = []
+        self.lag_ms = 0
+        self.gate_stats = { 'classified': 0, 'skipped': 0 }
 
-    def init(self, debug=False):
-        model_info = super(AudioImpulseRunner, self).init(debug)
+    def _load_model_info(self, model_info):
         if model_info['model_parameters']['frequency'] == 0:
             raise Exception('Model file "' + self._model_path + '" is not suitable for audio recognition')
 
@@ -139,8 +415,6 @@ class AudioImpulseRunner(ImpulseRunner):
         self.sampling_rate = model_info['model_parameters']['frequency']
         self.labels = model_info['model_parameters']['labels']
 
-        return model_info
-
     def __enter__(self):
         self.closed = False
         return self
@@ -151,16 +425,147 @@ class AudioImpulseRunner(ImpulseRunner):
     def classify(self, data):
         return super(AudioImpulseRunner, self).classify(data)
 
-    def classifier(self, device_id = None):
-        with Microphone(self.sampling_rate, CHUNK_SIZE, device_id=device_id) as mic:
+    def classifier(self, device_id = None, chunk_size = CHUNK_SIZE, stride = None,
+                   lag_policy = LAG_POLICY_ALL, max_lag_ms = None,
+                   max_queue_chunks = QUEUE_CHUNKS, drop_policy = DROP_OLDEST,
+                   channels = 1, pool = None, energy_threshold = None, source = None):
+        """Classify live microphone audio, yielding (result, audio) for every window.
+
+        Args:
+            device_id: The audio device to record from, None to pick the first compatible one.
+            chunk_size: Number of frames PortAudio hands over per callback.
+            stride: Number of samples to advance between windows,
+                defaults to window_size * OVERLAP.
+            lag_policy: One of LAG_POLICIES, decides what happens when classification
+                can't keep up with the incoming audio.
+            max_lag_ms: Lag tolerated before the policy kicks in (default 0).
+            max_queue_chunks: Number of captured chunks buffered before dropping audio.
+            drop_policy: One of DROP_POLICIES, which chunk to drop when the buffer is full.
+            channels: Number of channels to capture. Every channel is windowed and
+                classified separately, and result['channel'] holds the channel index.
+            pool: Optional RunnerPool for this model, used to classify the channels
+                of a window in parallel.
+            energy_threshold: Optional RMS level (in int16 sample units) below which a
+                window is not classified. A synthetic result with result['silence'] set
+                is yielded instead, and self.gate_stats counts classified/skipped windows.
+            source: Optional audio source to read from instead of the microphone, e.g. a
+                PcmSource, ArecordSource or GeneratorSource. Its rate has to match the
+                model, and its channel count is used instead of channels.
+
+        The current lag (audio received but not yet classified, in ms) is available
+        as self.lag_ms while iterating.
+        """
+        if lag_policy not in LAG_POLICIES:
+            raise Exception('Invalid lag_policy "' + str(lag_policy) + '", should be one of ' + ', '.join(LAG_POLICIES))
+
+        if stride is None:
+            stride = int(self.window_size * OVERLAP)
+        if stride <= 0:
+            raise Exception('stride should be larger than 0')
+        if max_lag_ms is None:
+            max_lag_ms = 0
+
+        max_lag_samples = int(max_lag_ms * self.sampling_rate / 1000)
+        current_stride = stride
+
+        if source is None:
+            source = Microphone(self.sampling_rate, chunk_size, device_id=device_id, channels=channels,
+                                max_queue_chunks=max_queue_chunks, drop_policy=drop_policy, interactive=False)
+        elif source.rate != self.sampling_rate:
+            raise Exception('Audio source rate (' + str(source.rate) + ') does not match the model (' + str(self.sampling_rate) + ')')
+        channels = source.channels
+
+        with source as mic:
             generator = mic.generator()
-            features = np.array([], dtype=np.int16)
-            while not self.closed:
-                for audio in generator:
-                    data = np.frombuffer(audio, dtype=np.int16)
-                    features = np.concatenate((features, data), axis=0)
-                    while len(features) >= self.window_size:
-                        begin = now()
-                        res = self.classify(features[:self.window_size].tolist())
-                        features = features[int(self.window_size * OVERLAP):]
+            # one row per frame, one column per channel; features[:, c] is a strided view
+            features = np.zeros((0, channels), dtype=np.int16)
+            for audio in generator:
+                if self.closed:
+                    break
+                data = np.frombuffer(audio, dtype=np.int16).reshape(-1, channels)
+                features = np.concatenate((features, data), axis=0)
+                while len(features) >= self.window_size:
+                    lag_samples = len(features) - self.window_size
+                    if lag_policy == LAG_POLICY_NEWEST and lag_samples > max_lag_samples:
+                        features = features[lag_samples:]
+                        lag_samples = 0
+                    elif lag_policy == LAG_POLICY_ADAPTIVE:
+                        if lag_samples > max_lag_samples:
+                            current_stride = min(current_stride * 2, max(stride, lag_samples))
+                        else:
+                            current_stride = max(stride, current_stride // 2)
+
+                    self.lag_ms = lag_samples * 1000 / self.sampling_rate
+                    window = features[:self.window_size]
+                    if energy_threshold is None:
+                        active = range(channels)
+                    else:
+                        rms = window_rms(window)
+                        active = np.flatnonzero(rms >= energy_threshold)
+                    self.gate_stats['classified'] += len(active)
+                    self.gate_stats['skipped'] += channels - len(active)
+
+                    results = [None] * channels
+                    if pool is not None and len(active) > 1:
+                        futures = [(c, pool.classify(window[:, c].tolist())) for c in active]
+                        for c, future in futures:
+                            results[c] = future.result()
+                    else:
+                        for c in active:
+                            results[c] = self.classify(window[:, c].tolist())
+                    for c in range(channels):
+                        if results[c] is None:
+                            results[c] = self.silence_result(float(rms[c]))
+                    features = features[current_stride:]
+
+                    for c, res in enumerate(results):
+                        if channels > 1:
+                            res['channel'] = c
                         yield res, audio
+
+    def silence_result(self, rms):
+        """Result yielded in place of classify() for windows skipped by the energy gate."""
+        return {
+            'result': { 'classification': { label: 0.0 for label in self.labels } },
+            'timing': { 'dsp': 0, 'classification': 0, 'anomaly': 0 },
+            'silence': True,
+            'rms': rms,
+        }
+
+    def classify_files(self, paths, stride = None, pool = None, pcm_rate = None, pcm_channels = 1):
+        """Classify WAV or raw PCM files, yielding (file, offset_ms, result) for every window.
+
+        Args:
+            paths: Iterable of file paths.
+            stride: Number of samples to advance between windows,
+                defaults to window_size * OVERLAP (same as classifier()).
+            pool: Optional RunnerPool for this model. Files are spread over its runners
+                and results are yielded per file as soon as a file is done.
+            pcm_rate: Sample rate of raw PCM files.
+            pcm_channels: Number of interleaved channels in raw PCM files.
+        """
+        if self.window_size == 0:
+            raise Exception('Runner has not initialized, please call init() first')
+        if stride is None:
+            stride = int(self.window_size * OVERLAP)
+        if stride <= 0:
+            raise Exception('stride should be larger than 0')
+
+        sampling_rate = self.sampling_rate
+        window_size = self.window_size
+
+        def classify_file(runner, path):
+            samples, rate = read_audio_file(path, pcm_rate, pcm_channels)
+            return path, [(offset_ms, runner.classify(window.tolist()))
+                for offset_ms, window in file_windows(samples, rate, sampling_rate, window_size, stride)]
+
+        if pool is None:
+            for path in paths:
+                samples, rate = read_audio_file(path, pcm_rate, pcm_channels)
+                for offset_ms, window in file_windows(samples, rate, sampling_rate, window_size, stride):
+                    yield path, offset_ms, self.classify(window.tolist())
+            return
+
+        for path, results in pool.map(classify_file, paths, ordered=False):
+            for offset_ms, res in results:
+                yield path, offset_ms, res
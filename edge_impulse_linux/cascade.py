@@ -0,0 +1,106 @@
+import time
+
+
+class CascadeStage:
+    """One model in a Cascade.
+
+    The next stage only runs when this stage's result passes: `condition(res)` if given,
+    otherwise any of `labels` (or any label, when labels is None) scoring at least
+    `min_score`, as a classification or a bounding box. The condition of the last stage
+    is not used.
+    """
+    def __init__(self, runner, name=None, labels=None, min_score=0.5, condition=None):
+        self.runner = runner
+        self.name = name or 'stage' + str(id(self))
+        self.labels = set(labels) if labels is not None else None
+        self.min_score = min_score
+        self.condition = condition
+
+    def passes(self, res):
+        if self.condition:
+            return bool(self.condition(res))
+
+        result = res['result']
+        if 'classification' in result:
+            for label, score in result['classification'].items():
+                if (self.labels is None or label in self.labels) and score >= self.min_score:
+                    return True
+        if 'bounding_boxes' in result:
+            for bb in result['bounding_boxes']:
+                if (self.labels is None or bb['label'] in self.labels) and bb['value'] >= self.min_score:
+                    return True
+        return False
+
+    def classify(self, data):
+        # image runners preprocess the frame with their own studio settings, others take features
+        if hasattr(self.runner, 'get_features_from_image_auto_studio_settings'):
+            features, cropped = self.runner.get_features_from_image_auto_studio_settings(data)
+            return self.runner.classify(features)
+        return self.runner.classify(data)
+
+
+class Cascade:
+    """Runs a chain of models on the same input, exiting early as soon as a stage's result
+    doesn't pass, so that expensive models only run when a cheap gate model finds something.
+
+    The merged response has the deepest stage's `result`, the summed `timing`, every stage's
+    response in `stages` (by name, in order) and the name of the last stage that ran in `exit`.
+    """
+    def __init__(self, stages):
+        if len(stages) < 2:
+            raise Exception('A cascade needs at least two stages')
+        names = [stage.name for stage in stages]
+        if len(set(names)) != len(names):
+            raise Exception('Duplicate stage names: ' + str(names))
+        self.stages = stages
+        self.stats = { stage.name: { 'runs': 0, 'passed': 0, 'time_ms': 0 } for stage in stages }
+        self.frames = 0
+
+    def init(self, debug=False, **kwargs):
+        return [stage.runner.init(debug, **kwargs) for stage in self.stages]
+
+    def stop(self):
+        for stage in self.stages:
+            stage.runner.stop()
+
+    def classify(self, data):
+        self.frames += 1
+        stages = {}
+        timing = {}
+        res = None
+        for ix, stage in enumerate(self.stages):
+            started = time.monotonic()
+            res = stage.classify(data)
+            stats = self.stats[stage.name]
+            stats['runs'] += 1
+            stats['time_ms'] += (time.monotonic() - started) * 1000
+
+            stages[stage.name] = res
+            for key, value in res.get('timing', {}).items():
+                timing[key] = timing.get(key, 0) + value
+
+            if ix == len(self.stages) - 1:
+                break
+            if not stage.passes(res):
+                break
+            stats['passed'] += 1
+
+        return {
+            'result': res['result'],
+            'timing': timing,
+            'stages': stages,
+            'exit': stage.name,
+        }
+
+    def hit_rates(self):
+        """Per stage: the fraction of frames that reached it, and the fraction of its
+        runs that passed on to the next stage (always 0 for the last stage)."""
+        rates = {}
+        for stage in self.stages:
+            stats = self.stats[stage.name]
+            rates[stage.name] = {
+                'reached': stats['runs'] / self.frames if self.frames else 0,
+                'passed': stats['passed'] / stats['runs'] if stats['runs'] else 0,
+                'avg_ms': stats['time_ms'] / stats['runs'] if stats['runs'] else 0,
+            }
+        return rates
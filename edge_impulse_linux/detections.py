@@ -0,0 +1,62 @@
+import numpy as np
+
+# Binary detection metadata: a native-endian uint16 object count, followed by one
+# record per object laid out like the C struct `{ uint8 confidence; uint16 x1, y1, x2, y2; }`
+# (native alignment, so 10 bytes per record: struct format "B4H").
+DETECTION_COUNT_DTYPE = np.dtype('=u2')
+DETECTION_DTYPE = np.dtype([
+    ('confidence', '=u1'),
+    ('x1', '=u2'),
+    ('y1', '=u2'),
+    ('x2', '=u2'),
+    ('y2', '=u2'),
+], align=True)
+
+# Columns of the arrays returned by decode_detections()
+CONFIDENCE, X1, Y1, X2, Y2 = range(5)
+
+
+def decode_detections(data, min_confidence=0, frame_size=None):
+    """Decode binary detection metadata into an (N, 5) array without per-object Python work.
+
+    Args:
+        data: The payload (bytes, bytearray or memoryview), it is viewed, not copied.
+        min_confidence (int): Detections with a lower confidence are dropped.
+        frame_size: Optional (width, height) to clip the coordinates to.
+
+    Returns:
+        numpy.ndarray: An int32 array with columns confidence, x1, y1, x2, y2.
+            Truncated payloads yield the complete records only.
+    """
+    if len(data) < DETECTION_COUNT_DTYPE.itemsize:
+        return np.zeros((0, 5), dtype=np.int32)
+
+    count = int(np.frombuffer(data, dtype=DETECTION_COUNT_DTYPE, count=1)[0])
+    available = (len(data) - DETECTION_COUNT_DTYPE.itemsize) // DETECTION_DTYPE.itemsize
+    records = np.frombuffer(data, dtype=DETECTION_DTYPE, count=min(count, available),
+                            offset=DETECTION_COUNT_DTYPE.itemsize)
+
+    if min_confidence > 0:
+        records = records[records['confidence'] >= min_confidence]
+
+    detections = np.empty((len(records), 5), dtype=np.int32)
+    for column, name in enumerate(DETECTION_DTYPE.names):
+        detections[:, column] = records[name]
+
+    if frame_size is not None:
+        clip_boxes(detections[:, X1:], frame_size[0], frame_size[1])
+    return detections
+
+
+def clip_boxes(boxes, width, height):
+    """Clip an (N, 4) array of x1, y1, x2, y2 to the frame bounds, in place when possible.
+
+    Returns:
+        numpy.ndarray: The clipped boxes.
+    """
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    if not np.issubdtype(boxes.dtype, np.integer) or not boxes.flags.writeable:
+        boxes = boxes.astype(np.int32)
+    np.clip(boxes[:, 0::2], 0, width, out=boxes[:, 0::2])
+    np.clip(boxes[:, 1::2], 0, height, out=boxes[:, 1::2])
+    return boxes
@@ -0,0 +1,73 @@
+import threading
+import numpy as np
+
+
+class FramePool():
+    """A fixed set of preallocated frame buffers that are recycled between uses.
+
+    acquire() hands out a free buffer, release() gives it back. Buffers are reference
+    counted: when a frame is handed to several consumers, call retain() once per extra
+    consumer and it only goes back to the pool after the last release(). Nothing is
+    allocated after construction, so memory use stays flat no matter the frame rate.
+    """
+    def __init__(self, shape, dtype=np.uint8, size=4):
+        if size <= 0:
+            raise Exception('A frame pool needs at least one buffer')
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.size = size
+        self._buffers = [np.empty(self.shape, dtype=self.dtype) for _ in range(size)]
+        self._owned = set(id(buf) for buf in self._buffers)
+        self._free = list(self._buffers)
+        self._refs = {}
+        self._cond = threading.Condition()
+        self.stats = {
+            'acquired': 0,
+            'exhausted': 0,     # acquire() calls that found no free buffer
+            'in_use': 0,
+            'peak_in_use': 0,
+        }
+
+    def acquire(self, timeout=0):
+        """Return a free buffer (contents undefined), or None if none frees up within timeout.
+
+        timeout=0 never waits, timeout=None waits forever.
+        """
+        with self._cond:
+            if not self._free:
+                self.stats['exhausted'] += 1
+                if timeout == 0 or not self._cond.wait_for(lambda: self._free, timeout):
+                    return None
+            buf = self._free.pop()
+            self._refs[id(buf)] = 1
+            self.stats['acquired'] += 1
+            self.stats['in_use'] += 1
+            self.stats['peak_in_use'] = max(self.stats['peak_in_use'], self.stats['in_use'])
+            return buf
+
+    def retain(self, buf):
+        """Add a reference to an acquired buffer, buffers the pool does not own are ignored."""
+        if id(buf) not in self._owned:
+            return buf
+        with self._cond:
+            self._refs[id(buf)] += 1
+        return buf
+
+    def release(self, buf):
+        """Drop a reference, the buffer goes back to the pool with the last one.
+
+        Buffers the pool does not own are ignored.
+        """
+        if id(buf) not in self._owned:
+            return
+        with self._cond:
+            self._refs[id(buf)] -= 1
+            if self._refs[id(buf)] > 0:
+                return
+            del self._refs[id(buf)]
+            self._free.append(buf)
+            self.stats['in_use'] -= 1
+            self._cond.notify()
+
+    def matches(self, shape, dtype=np.uint8):
+        return self.shape == tuple(shape) and self.dtype == np.dtype(dtype)
@@ -0,0 +1,93 @@
+import collections
+import time
+import psutil
+
+# how far below the targets the measurements need to be before the rate goes up again
+HEADROOM = 0.8
+
+
+class RateGovernor:
+    """Adapts the inference rate to a latency SLO and/or a CPU utilization budget.
+
+    Call wait() before grabbing a frame and record(latency_ms) after classifying it. Every
+    `interval` seconds the governor compares the mean latency and the system-wide CPU
+    utilization (psutil) against the targets: the rate is cut multiplicatively when either
+    is exceeded, and raised additively when both are comfortably below target. Decisions are
+    kept in `decisions` and passed to `on_decision` if given.
+    """
+    def __init__(self, latency_slo_ms=None, cpu_budget=None, min_fps=1, max_fps=30, start_fps=10,
+                 interval=1.0, step_fps=1, backoff=0.75, on_decision=None):
+        if latency_slo_ms is None and cpu_budget is None:
+            raise Exception('RateGovernor needs a latency_slo_ms and/or a cpu_budget')
+        if min_fps <= 0 or max_fps < min_fps:
+            raise Exception('Invalid fps range: ' + str(min_fps) + '-' + str(max_fps))
+
+        self.latency_slo_ms = latency_slo_ms
+        self.cpu_budget = cpu_budget
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.fps = min(max(start_fps, min_fps), max_fps)
+        self.interval = interval
+        self.step_fps = step_fps
+        self.backoff = backoff
+        self.on_decision = on_decision
+        self.decisions = collections.deque(maxlen=100)
+
+        self._next_frame = 0
+        self._latency_sum = 0
+        self._latency_count = 0
+        self._window_start = time.monotonic()
+        # the first call only primes psutil's counters
+        psutil.cpu_percent(interval=None)
+
+    def wait(self):
+        """Sleep until the next frame is due at the current rate."""
+        now = time.monotonic()
+        if self._next_frame > now:
+            time.sleep(self._next_frame - now)
+            now = self._next_frame
+        self._next_frame = now + 1.0 / self.fps
+
+    def record(self, latency_ms):
+        """Record the latency of one inference, re-evaluating the rate once per interval."""
+        self._latency_sum += latency_ms
+        self._latency_count += 1
+
+        now = time.monotonic()
+        if now - self._window_start < self.interval:
+            return None
+
+        latency = self._latency_sum / self._latency_count
+        cpu = psutil.cpu_percent(interval=None)
+        self._latency_sum = 0
+        self._latency_count = 0
+        self._window_start = now
+        return self._decide(latency, cpu)
+
+    def _decide(self, latency, cpu):
+        over_latency = self.latency_slo_ms is not None and latency > self.latency_slo_ms
+        over_cpu = self.cpu_budget is not None and cpu > self.cpu_budget
+        under_latency = self.latency_slo_ms is None or latency < self.latency_slo_ms * HEADROOM
+        under_cpu = self.cpu_budget is None or cpu < self.cpu_budget * HEADROOM
+
+        prev_fps = self.fps
+        if over_latency or over_cpu:
+            self.fps = max(self.min_fps, self.fps * self.backoff)
+            reason = 'latency' if over_latency else 'cpu'
+        elif under_latency and under_cpu:
+            self.fps = min(self.max_fps, self.fps + self.step_fps)
+            reason = 'headroom'
+        else:
+            reason = 'hold'
+
+        decision = {
+            'fps': self.fps,
+            'prev_fps': prev_fps,
+            'latency_ms': latency,
+            'cpu_percent': cpu,
+            'reason': reason,
+        }
+        self.decisions.append(decision)
+        if self.on_decision:
+            self.on_decision(decision)
+        return decision
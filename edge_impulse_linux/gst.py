@@ -0,0 +1,120 @@
+# GStreamer helpers. PyGObject (gi) is not a dependency of this package, so this
+# module is not imported by edge_impulse_linux/__init__.py; import it explicitly.
+import gi
+import numpy as np
+from edge_impulse_linux.frame_pool import FramePool
+gi.require_version('Gst', '1.0')
+gi.require_version('GstVideo', '1.0')
+from gi.repository import Gst, GstVideo
+
+
+def video_info_from_caps(caps):
+    # VideoInfo.new_from_caps was only added in GStreamer 1.20
+    if hasattr(GstVideo.VideoInfo, 'new_from_caps'):
+        return GstVideo.VideoInfo.new_from_caps(caps)
+    info = GstVideo.VideoInfo()
+    info.from_caps(caps)
+    return info
+
+
+def sample_clock_time(sample, element):
+    """When a sample is due on its pipeline's clock, in seconds.
+
+    This is the buffer's running time plus the element's base time, so unlike the raw PTS
+    (which counts from each pipeline's own start) it can be compared between pipelines
+    that use the same clock, e.g. Gst.SystemClock.obtain(). Buffers without a PTS get
+    the current clock time.
+    """
+    clock = element.get_clock() or Gst.SystemClock.obtain()
+    buf = sample.get_buffer()
+    if buf.pts == Gst.CLOCK_TIME_NONE:
+        return clock.get_time() / Gst.SECOND
+
+    running_time = sample.get_segment().to_running_time(Gst.Format.TIME, buf.pts)
+    if running_time == Gst.CLOCK_TIME_NONE:
+        running_time = buf.pts
+    return (element.get_base_time() + running_time) / Gst.SECOND
+
+
+class AppSinkAdapter():
+    """Turns appsink samples into pooled NumPy frames.
+
+    Every mapped buffer is copied exactly once, into a recycled (height, width, channels)
+    uint8 frame from a FramePool, and unmapped before on_frame(frame, timestamp) is called.
+    The receiver of the frame owns one reference and must call release(frame) when done
+    (use retain(frame) to hand it to more consumers). When the pool is exhausted the
+    sample is dropped and counted instead of allocating a new frame, so are buffers that
+    are too small for their caps.
+
+    The row stride and plane offset come from the buffer's GstVideoMeta, or else from the
+    caps, so padded rows are handled.
+
+    timestamp is the sample's clock time in seconds, see sample_clock_time().
+    """
+    def __init__(self, appsink, on_frame, pool_size=4, channels=3):
+        self.on_frame = on_frame
+        self.pool_size = pool_size
+        self.channels = channels
+        self.pool = None
+        self.stats = { 'frames': 0, 'dropped': 0, 'map_failed': 0, 'copy_failed': 0 }
+        self._caps = None
+        self._video_info = None
+        appsink.connect('new-sample', self.on_new_sample)
+
+    def retain(self, frame):
+        return self.pool.retain(frame)
+
+    def release(self, frame):
+        if self.pool is not None:
+            self.pool.release(frame)
+
+    def on_new_sample(self, appsink):
+        sample = appsink.emit('pull-sample')
+        if not sample:
+            return Gst.FlowReturn.ERROR
+
+        buf = sample.get_buffer()
+        caps = sample.get_caps()
+        if self._caps is None or not caps.is_equal(self._caps):
+            self._video_info = video_info_from_caps(caps)
+            self._caps = caps
+        w = self._video_info.width
+        h = self._video_info.height
+        shape = (h, w, self.channels)
+
+        if self.pool is None or not self.pool.matches(shape):
+            self.pool = FramePool(shape, np.uint8, self.pool_size)
+
+        frame = self.pool.acquire()
+        if frame is None:
+            self.stats['dropped'] += 1
+            return Gst.FlowReturn.OK
+
+        success, info = buf.map(Gst.MapFlags.READ)
+        if not success:
+            self.pool.release(frame)
+            self.stats['map_failed'] += 1
+            return Gst.FlowReturn.ERROR
+
+        try:
+            # rows may be padded (e.g. RGB rows are 4-byte aligned), so go via the row stride
+            meta = GstVideo.buffer_get_video_meta(buf)
+            if meta is not None:
+                offset, stride = meta.offset[0], meta.stride[0]
+            else:
+                offset, stride = self._video_info.offset[0], self._video_info.stride[0]
+            # raises when the buffer is too small for this layout
+            src = np.ndarray(shape, dtype=np.uint8, buffer=info.data, offset=offset,
+                             strides=(stride, self.channels, 1))
+            np.copyto(frame, src)
+        except Exception:
+            # skip this buffer, but don't lose the pooled frame
+            self.pool.release(frame)
+            self.stats['copy_failed'] += 1
+            return Gst.FlowReturn.OK
+        finally:
+            buf.unmap(info)
+
+        self.stats['frames'] += 1
+        self.on_frame(frame, sample_clock_time(sample, appsink))
+        return Gst.FlowReturn.OK
@@ -5,6 +5,8 @@ import cv2
 from edge_impulse_linux.runner import ImpulseRunner
 import math
 import psutil
+import time
+from functools import lru_cache
 
 class ImageImpulseRunner(ImpulseRunner):
     def __init__(self, model_path: str):
@@ -16,8 +18,7 @@ class ImageImpulseRunner(ImpulseRunner):
         self.isGrayscale = False
         self.resizeMode = ''
 
-    def init(self, debug=False):
-        model_info = super(ImageImpulseRunner, self).init(debug)
+    def _load_model_info(self, model_info):
         width = model_info['model_parameters']['image_input_width']
         height = model_info['model_parameters']['image_input_height']
 
@@ -28,7 +29,6 @@ class ImageImpulseRunner(ImpulseRunner):
         self.labels = model_info['model_parameters']['labels']
         self.isGrayscale = model_info['model_parameters']['image_channel_count'] == 1
         self.resizeMode = model_info['model_parameters'].get('image_resize_mode', 'not-reported')
-        return model_info
 
     def __enter__(self):
         self.videoCapture = cv2.VideoCapture()
@@ -56,25 +56,57 @@ class ImageImpulseRunner(ImpulseRunner):
                 yield img
 
     # This returns images in RGB format (not BGR)
-    def classifier(self, videoDeviceId = 0):
+    # With a PreprocessingPool, frames are preprocessed in its worker processes while the
+    # previous frame is being classified. The pool uses studio-mode preprocessing (like
+    # get_features_from_image_auto_studio_settings, not get_features_from_image), and must
+    # be built for this model: PreprocessingPool(runner.resizeMode, runner.dim[0], runner.dim[1], runner.isGrayscale)
+    def classifier(self, videoDeviceId = 0, preprocess_pool = None, governor = None):
+        if preprocess_pool is not None:
+            self._check_preprocess_pool(preprocess_pool)
+
         if psutil.OSX or psutil.MACOS:
             print('Make sure to grant the this script access to your webcam.')
             print('If your webcam is not responding, try running "tccutil reset Camera" to reset the camera access privileges.')
 
         self.videoCapture = cv2.VideoCapture(videoDeviceId)
+        pending = []
         while not self.closed:
+            # governor (a RateGovernor) paces the frame grabs, and is fed capture-to-result latency
+            if governor:
+                governor.wait()
             success, img = self.videoCapture.read()
-            if success:
-                img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                features, cropped = self.get_features_from_image(img)
+            captured = time.monotonic()
+            if preprocess_pool is None:
+                if success:
+                    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+                    features, cropped = self.get_features_from_image(img)
+
+                    res = self.classify(features)
+                    if governor:
+                        governor.record((time.monotonic() - captured) * 1000)
+                    yield res, cropped
+                continue
 
+            if success:
+                pending.append((preprocess_pool.submit(cv2.cvtColor(img, cv2.COLOR_BGR2RGB)), captured))
+            # keep one frame in flight in the pool while classifying the previous one
+            if len(pending) > 1 or (pending and not success):
+                ticket, captured = pending.pop(0)
+                features, cropped = preprocess_pool.result(ticket)
                 res = self.classify(features)
+                if governor:
+                    governor.record((time.monotonic() - captured) * 1000)
                 yield res, cropped
 
+    def _check_preprocess_pool(self, pool):
+        expected = (self.resizeMode, self.dim[0], self.dim[1], self.isGrayscale)
+        actual = (pool.mode, pool.output_width, pool.output_height, pool.is_grayscale)
+        if actual != expected:
+            raise Exception('Preprocessing pool (mode, width, height, grayscale) ' + str(actual) +
+                            ' does not match the model ' + str(expected))
+
     # This expects images in RGB format (not BGR), DEPRECATED, use get_features_from_image_auto_studio_settings
     def get_features_from_image(self, img, crop_direction_x='center', crop_direction_y='center'):
-        features = []
-
         EI_CLASSIFIER_INPUT_WIDTH = self.dim[0]
         EI_CLASSIFIER_INPUT_HEIGHT = self.dim[1]
 
@@ -117,18 +149,8 @@ class ImageImpulseRunner(ImpulseRunner):
 
         if self.isGrayscale:
             cropped = cv2.cvtColor(cropped, cv2.COLOR_BGR2GRAY)
-            pixels = np.array(cropped).flatten().tolist()
 
-            for p in pixels:
-                features.append((p << 16) + (p << 8) + p)
-        else:
-            pixels = np.array(cropped).flatten().tolist()
-
-            for ix in range(0, len(pixels), 3):
-                r = pixels[ix + 0]
-                g = pixels[ix + 1]
-                b = pixels[ix + 2]
-                features.append((r << 16) + (g << 8) + b)
+        features = pack_features(cropped).tolist()
 
         return features, cropped
 
@@ -155,19 +177,12 @@ def resize_image(image, size):
     """
     return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
 
-def resize_with_letterbox(image, target_width, target_height):
-    """Resize an image while maintaining aspect ratio using letterboxing.
-
-    Args:
-        image: The input image as a NumPy array.
-        target_size: A tuple (width, height) specifying the desired output size.
+@lru_cache(maxsize=64)
+def letterbox_geometry(width, height, target_width, target_height):
+    """Compute (new_width, new_height, top, bottom, left, right) for letterboxing.
 
-    Returns:
-        The resized image as a NumPy array and the letterbox dimensions.
+    The result only depends on the frame and target sizes, so it is cached.
     """
-
-    height, width = image.shape[:2]
-
     # Calculate scale factors to preserve aspect ratio
     scale_x = target_width / width
     scale_y = target_height / height
@@ -180,6 +195,50 @@ def resize_with_letterbox(image, target_width, target_height):
     bottom_pad = target_height - new_height - top_pad
     left_pad = (target_width - new_width) // 2
     right_pad = target_width - new_width - left_pad
+    return new_width, new_height, top_pad, bottom_pad, left_pad, right_pad
+
+@lru_cache(maxsize=64)
+def fit_shortest_crop(width, height, target_width, target_height):
+    """Compute the centered (x, y, w, h) crop that matches the target aspect ratio (cached)."""
+    aspect_ratio = target_width / target_height
+    if width / height > aspect_ratio:
+        # Image is wider than target aspect ratio
+        new_width = int(height * aspect_ratio)
+        return (width - new_width) // 2, 0, new_width, height
+    else:
+        # Image is taller than target aspect ratio
+        new_height = int(width / aspect_ratio)
+        return 0, (height - new_height) // 2, width, new_height
+
+def pack_features(img):
+    """Pack pixels into the runner's feature format in one vectorized pass.
+
+    Args:
+        img (numpy.ndarray): uint8 image, (H, W, 3) RGB or (H, W) grayscale.
+
+    Returns:
+        numpy.ndarray: A flat int64 array with (R << 16) + (G << 8) + B per pixel,
+        or (P << 16) + (P << 8) + P for grayscale images.
+    """
+    if img.ndim == 2:
+        return img.reshape(-1).astype(np.int64) * 0x010101
+    pixels = img.reshape(-1, 3).astype(np.int64)
+    return (pixels[:, 0] << 16) | (pixels[:, 1] << 8) | pixels[:, 2]
+
+def resize_with_letterbox(image, target_width, target_height):
+    """Resize an image while maintaining aspect ratio using letterboxing.
+
+    Args:
+        image: The input image as a NumPy array.
+        target_size: A tuple (width, height) specifying the desired output size.
+
+    Returns:
+        The resized image as a NumPy array and the letterbox dimensions.
+    """
+
+    height, width = image.shape[:2]
+    new_width, new_height, top_pad, bottom_pad, left_pad, right_pad = letterbox_geometry(
+        width, height, target_width, target_height)
 
     # Resize image and add padding
     resized_image = resize_image(image, (new_width, new_height))
@@ -188,9 +247,9 @@ def resize_with_letterbox(image, target_width, target_height):
     return padded_image
 
 
-def get_features_from_image_with_studio_mode(img, mode, output_width, output_height, is_grayscale):
+def resize_with_studio_mode(img, mode, output_width, output_height, is_grayscale):
     """
-    Extract features from an image using different resizing modes suitable for Edge Impulse Studio.
+    Resize (and optionally grayscale) an image the way Edge Impulse Studio does for the given mode.
 
     Args:
         img (numpy.ndarray): The input image as a NumPy array.
@@ -200,28 +259,14 @@ def get_features_from_image_with_studio_mode(img, mode, output_width, output_hei
         is_grayscale (bool): Whether the output image should be converted to grayscale.
 
     Returns:
-        tuple: A tuple containing:
-            - features (list): A list of pixel values in the format (R << 16) + (G << 8) + B for color images,
-              or (P << 16) + (P << 8) + P for grayscale images.
-            - resized_img (numpy.ndarray): The resized image as a NumPy array.
+        numpy.ndarray: The resized image.
     """
-    features = []
-
     in_frame_cols = img.shape[1]
     in_frame_rows = img.shape[0]
 
     if mode == 'fit-shortest':
-        aspect_ratio = output_width / output_height
-        if in_frame_cols / in_frame_rows > aspect_ratio:
-            # Image is wider than target aspect ratio
-            new_width = int(in_frame_rows * aspect_ratio)
-            offset = (in_frame_cols - new_width) // 2
-            cropped_img = img[:, offset:offset + new_width]
-        else:
-            # Image is taller than target aspect ratio
-            new_height = int(in_frame_cols / aspect_ratio)
-            offset = (in_frame_rows - new_height) // 2
-            cropped_img = img[offset:offset + new_height, :]
+        x, y, w, h = fit_shortest_crop(in_frame_cols, in_frame_rows, output_width, output_height)
+        cropped_img = img[y:y + h, x:x + w]
 
         resized_img = cv2.resize(cropped_img, (output_width, output_height), interpolation=cv2.INTER_AREA)
     elif mode == 'fit-longest':
@@ -233,17 +278,170 @@ def get_features_from_image_with_studio_mode(img, mode, output_width, output_hei
 
     if is_grayscale:
         resized_img = cv2.cvtColor(resized_img, cv2.COLOR_BGR2GRAY)
-        pixels = np.array(resized_img).flatten().tolist()
 
-        for p in pixels:
-            features.append((p << 16) + (p << 8) + p)
-    else:
-        pixels = np.array(resized_img).flatten().tolist()
+    return resized_img
 
-        for ix in range(0, len(pixels), 3):
-            r = pixels[ix + 0]
-            g = pixels[ix + 1]
-            b = pixels[ix + 2]
-            features.append((r << 16) + (g << 8) + b)
 
-    return features, resized_img
\ No newline at end of file
+def get_features_from_image_with_studio_mode(img, mode, output_width, output_height, is_grayscale):
+    """
+    Extract features from an image using different resizing modes suitable for Edge Impulse Studio.
+
+    Args:
+        img (numpy.ndarray): The input image as a NumPy array.
+        mode (str): The resizing mode to use. Options are 'fit-shortest', 'fit-longest', and 'squash'.
+        output_width (int): The desired output width of the image.
+        output_height (int): The desired output height of the image.
+        is_grayscale (bool): Whether the output image should be converted to grayscale.
+
+    Returns:
+        tuple: A tuple containing:
+            - features (list): A list of pixel values in the format (R << 16) + (G << 8) + B for color images,
+              or (P << 16) + (P << 8) + P for grayscale images.
+            - resized_img (numpy.ndarray): The resized image as a NumPy array.
+    """
+    resized_img = resize_with_studio_mode(img, mode, output_width, output_height, is_grayscale)
+    features = pack_features(resized_img).tolist()
+
+    return features, resized_img
+
+
+def _slot_layout(max_frame_shape, output_width, output_height, is_grayscale):
+    """Byte offsets (frame, features, resized, stride) of one PreprocessingPool slot."""
+    align = lambda n: (n + 63) // 64 * 64
+    frame_bytes = int(np.prod(max_frame_shape))
+    features_bytes = output_width * output_height * 4
+    resized_bytes = output_width * output_height * (1 if is_grayscale else 3)
+    features_offset = align(frame_bytes)
+    resized_offset = features_offset + align(features_bytes)
+    return 0, features_offset, resized_offset, resized_offset + align(resized_bytes)
+
+
+def _preprocess_worker(shm_name, slots, max_frame_shape, mode, output_width, output_height, is_grayscale,
+                       tasks, done):
+    """Worker process of PreprocessingPool: resizes and packs frames in place in shared memory."""
+    from multiprocessing import shared_memory
+    cv2.setNumThreads(1)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _, features_offset, resized_offset, stride = _slot_layout(max_frame_shape, output_width, output_height, is_grayscale)
+    resized_shape = (output_height, output_width) if is_grayscale else (output_height, output_width, 3)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            slot, shape = task
+            base = slot * stride
+            try:
+                frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=base)
+                features = np.ndarray((output_width * output_height,), dtype=np.int32, buffer=shm.buf,
+                                      offset=base + features_offset)
+                resized = np.ndarray(resized_shape, dtype=np.uint8, buffer=shm.buf, offset=base + resized_offset)
+
+                resized_img = resize_with_studio_mode(frame, mode, output_width, output_height, is_grayscale)
+                np.copyto(resized, resized_img)
+                features[:] = pack_features(resized_img)
+                del frame, features, resized
+                done.put((slot, None))
+            except Exception as e:
+                done.put((slot, str(e)))
+    finally:
+        shm.close()
+
+
+class PreprocessingPool():
+    """Runs studio-mode preprocessing (see get_features_from_image_with_studio_mode) in worker processes.
+
+    Frames and features are exchanged through multiprocessing.shared_memory slots, only the
+    slot number travels over the task queues, so nothing is pickled per frame. Frames must
+    be uint8 and fit in max_frame_shape (height, width, channels).
+
+    To match a model use PreprocessingPool(runner.resizeMode, runner.dim[0], runner.dim[1], runner.isGrayscale).
+    """
+    def __init__(self, mode, output_width, output_height, is_grayscale, workers=2,
+                 max_frame_shape=(1080, 1920, 3), slots=None):
+        import multiprocessing
+        from multiprocessing import shared_memory
+        from six.moves import queue
+
+        if mode not in ('fit-shortest', 'fit-longest', 'squash'):
+            raise ValueError(f"Unsupported mode: {mode}")
+        self.mode = mode
+        self.output_width = output_width
+        self.output_height = output_height
+        self.is_grayscale = is_grayscale
+        self.max_frame_shape = tuple(max_frame_shape)
+        self.slots = slots if slots is not None else workers * 2
+        _, self._features_offset, self._resized_offset, self._stride = _slot_layout(
+            self.max_frame_shape, output_width, output_height, is_grayscale)
+
+        self._shm = shared_memory.SharedMemory(create=True, size=self._stride * self.slots)
+        self._free = queue.Queue()
+        for slot in range(self.slots):
+            self._free.put(slot)
+        self._done = {}
+        self._tasks = multiprocessing.Queue()
+        self._results = multiprocessing.Queue()
+        self._workers = [
+            multiprocessing.Process(target=_preprocess_worker, daemon=True, args=(
+                self._shm.name, self.slots, self.max_frame_shape, mode, output_width, output_height,
+                is_grayscale, self._tasks, self._results))
+            for _ in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, img):
+        """Copy img into a free slot (waits for one) and queue it, returns a ticket for result()."""
+        if img.dtype != np.uint8 or img.ndim != 3 or any(a > b for a, b in zip(img.shape, self.max_frame_shape)):
+            raise Exception('Frame ' + str(img.shape) + ' ' + str(img.dtype) + ' does not fit the preprocessing pool (max ' +
+                            str(self.max_frame_shape) + ' uint8)')
+        slot = self._free.get()
+        frame = np.ndarray(img.shape, dtype=np.uint8, buffer=self._shm.buf, offset=slot * self._stride)
+        np.copyto(frame, img)
+        self._tasks.put((slot, img.shape))
+        return slot
+
+    def result(self, ticket, timeout=None):
+        """Wait for a submitted frame, returns (features, resized_img) like get_features_from_image_with_studio_mode."""
+        while ticket not in self._done:
+            slot, error = self._results.get(timeout=timeout)
+            self._done[slot] = error
+        error = self._done.pop(ticket)
+        try:
+            if error is not None:
+                raise Exception('Preprocessing failed: ' + error)
+            base = ticket * self._stride
+            features = np.ndarray((self.output_width * self.output_height,), dtype=np.int32,
+                                  buffer=self._shm.buf, offset=base + self._features_offset).tolist()
+            shape = (self.output_height, self.output_width) if self.is_grayscale else (self.output_height, self.output_width, 3)
+            resized = np.ndarray(shape, dtype=np.uint8, buffer=self._shm.buf, offset=base + self._resized_offset).copy()
+            return features, resized
+        finally:
+            self._free.put(ticket)
+
+    def map(self, imgs):
+        """Preprocess an iterable of frames, keeping every slot busy, yields results in order."""
+        pending = []
+        for img in imgs:
+            if len(pending) == self.slots:
+                yield self.result(pending.pop(0))
+            pending.append(self.submit(img))
+        for ticket in pending:
+            yield self.result(ticket)
+
+    def close(self):
+        if self._shm is None:
+            return
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
@@ -0,0 +1,90 @@
+import collections
+import concurrent.futures
+import cv2
+from edge_impulse_linux.image import fit_shortest_crop, resize_with_studio_mode, pack_features
+
+
+def required_scale(mode, width, height, output_width, output_height):
+    """The smallest downscale factor of a (width, height) frame that still has enough
+    pixels to produce the output with the given resize mode."""
+    if mode == 'fit-shortest':
+        x, y, w, h = fit_shortest_crop(width, height, output_width, output_height)
+        return max(output_width / w, output_height / h)
+    if mode == 'fit-longest':
+        return min(output_width / width, output_height / height)
+    return max(output_width / width, output_height / height)
+
+
+class MultiImageRunner:
+    """Runs several ImageImpulseRunners on the same frames, preprocessing once per group.
+
+    Runners with the same input size and resize mode share one resize, grayscale models
+    convert that shared resize, and the models then classify concurrently. With pyramid=True
+    each resize starts from the smallest halving of the frame that still has enough pixels,
+    instead of from the full frame; set pyramid=False for features identical to
+    get_features_from_image_auto_studio_settings.
+    """
+    def __init__(self, runners, pyramid=True):
+        self.runners = runners
+        self.pyramid = pyramid
+        self.groups = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(runners),
+                                                               thread_name_prefix='multi-runner')
+
+    def init(self, debug=False, **kwargs):
+        model_info = [runner.init(debug, **kwargs) for runner in self.runners]
+        self._build_groups()
+        return model_info
+
+    def stop(self):
+        self._executor.shutdown(wait=True)
+        for runner in self.runners:
+            runner.stop()
+
+    def _build_groups(self):
+        # (width, height, mode) -> { is_grayscale -> [runner indices] }
+        groups = collections.OrderedDict()
+        for ix, runner in enumerate(self.runners):
+            if runner.resizeMode == '':
+                raise Exception('Runner has not initialized, please call init() first')
+            if runner.resizeMode == 'not-reported':
+                raise Exception('Model file "' + runner._model_path + '" does not report the image resize mode\n'
+                                'Please update the model file via edge-impulse-linux-runner --download')
+            key = (runner.dim[0], runner.dim[1], runner.resizeMode)
+            groups.setdefault(key, {}).setdefault(runner.isGrayscale, []).append(ix)
+        self.groups = groups
+
+    def preprocess(self, img):
+        """Returns a (features, cropped) tuple per runner, for an RGB frame."""
+        if self.groups is None:
+            self._build_groups()
+
+        height, width = img.shape[:2]
+        levels = [img]
+        out = [None] * len(self.runners)
+        for (w, h, mode), by_grayscale in self.groups.items():
+            source = img
+            if self.pyramid:
+                needed = required_scale(mode, width, height, w, h)
+                while levels[-1].shape[1] // 2 >= width * needed and levels[-1].shape[0] // 2 >= height * needed:
+                    prev = levels[-1]
+                    levels.append(cv2.resize(prev, (prev.shape[1] // 2, prev.shape[0] // 2), interpolation=cv2.INTER_AREA))
+                for level in levels:
+                    if level.shape[1] >= width * needed and level.shape[0] >= height * needed:
+                        source = level
+
+            resized = resize_with_studio_mode(source, mode, w, h, False)
+            for is_grayscale, indices in by_grayscale.items():
+                cropped = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY) if is_grayscale else resized
+                features = pack_features(cropped).tolist()
+                for ix in indices:
+                    out[ix] = (features, cropped)
+        return out
+
+    def classify(self, img):
+        """Preprocess an RGB frame and classify it with every runner concurrently.
+        Returns a (res, cropped) tuple per runner, in the order the runners were given."""
+        inputs = self.preprocess(img)
+        futures = [self._executor.submit(runner.classify, features)
+                   for runner, (features, cropped) in zip(self.runners, inputs)]
+        return [(future.result(), cropped) for future, (features, cropped) in zip(futures, inputs)]
@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from six.moves import queue
+from edge_impulse_linux.runner import ImpulseRunner
+
+
+class RunnerPool():
+    """A fixed set of runners for the same model, used from a thread pool.
+
+    Every runner is its own process, so classifying on several of them at once
+    scales across cores. Each runner is only ever used by one thread at a time.
+    """
+    def __init__(self, model_path: str, size=2, runner_class=ImpulseRunner):
+        if size <= 0:
+            raise Exception('A runner pool needs at least one runner')
+        self._model_path = model_path
+        self.size = size
+        self.runners = [runner_class(model_path) for _ in range(size)]
+        self._idle = queue.Queue()
+        self._executor = None
+
+    def init(self, debug=False, **kwargs):
+        model_info = None
+        for runner in self.runners:
+            model_info = runner.init(debug, **kwargs)
+            self._idle.put(runner)
+        self._executor = ThreadPoolExecutor(max_workers=self.size)
+        return model_info
+
+    def stop(self):
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        for runner in self.runners:
+            runner.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    def _run(self, fn, args):
+        runner = self._idle.get()
+        try:
+            return fn(runner, *args)
+        finally:
+            self._idle.put(runner)
+
+    def submit(self, fn, *args):
+        """Run fn(runner, *args) on the next idle runner, returns a Future."""
+        if not self._executor:
+            raise Exception("RunnerPool is not initialized (call init())")
+        return self._executor.submit(self._run, fn, args)
+
+    def classify(self, data):
+        """Classify on the next idle runner, returns a Future."""
+        return self.submit(lambda runner, d: runner.classify(d), data)
+
+    def map(self, fn, items, ordered=True):
+        """Run fn(runner, item) for every item, yielding results in order, or as they complete."""
+        futures = [self.submit(fn, item) for item in items]
+        if ordered:
+            for future in futures:
+                yield future.result()
+        else:
+            for future in as_completed(futures):
+                yield future.result()
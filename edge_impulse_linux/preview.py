@@ -0,0 +1,190 @@
+import threading
+import time
+import cv2
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+BOUNDARY = 'eiframe'
+
+_INDEX = b'''<!DOCTYPE html>
+<html><head><title>Edge Impulse preview</title></head>
+<body style="margin:0;background:#111"><img src="/stream" style="max-width:100%"></body></html>
+'''
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def draw_result(img, result, color=(255, 0, 0)):
+    """Draw bounding boxes, anomaly cells and the top classification label from a runner response onto img (in place)."""
+    res = (result or {}).get('result', {})
+    for bb in res.get('bounding_boxes', []):
+        cv2.rectangle(img, (bb['x'], bb['y']), (bb['x'] + bb['width'], bb['y'] + bb['height']), color, 1)
+        cv2.putText(img, '%s %.2f' % (bb['label'], bb['value']), (bb['x'], max(bb['y'] - 2, 8)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.3, color, 1)
+    for cell in res.get('visual_anomaly_grid', []):
+        cv2.rectangle(img, (cell['x'], cell['y']), (cell['x'] + cell['width'], cell['y'] + cell['height']), (255, 125, 0), 1)
+    classification = res.get('classification')
+    if classification:
+        label = max(classification, key=classification.get)
+        cv2.putText(img, '%s %.2f' % (label, classification[label]), (2, 12),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+    return img
+
+
+class PreviewServer():
+    """MJPEG-over-HTTP preview of the latest frame and result.
+
+    update() only keeps a reference to the newest frame; frames are annotated and
+    JPEG-encoded only while at least one client is connected, at most `fps` times per
+    second and once per frame no matter how many clients watch. Open
+    http://<host>:<port>/ in a browser, or point a player at /stream.
+
+    Frames are RGB by default (like the rest of the SDK), pass bgr=True for OpenCV frames.
+    """
+    def __init__(self, port=4912, host='127.0.0.1', fps=5, quality=80, bgr=False):
+        self.port = port
+        self.host = host
+        self.fps = fps
+        self.quality = quality
+        self.bgr = bgr
+        self.clients = 0
+        self.stats = { 'updates': 0, 'encoded': 0 }
+        self._cond = threading.Condition()
+        self._frame = None
+        self._result = None
+        self._seq = 0
+        self._jpeg = None
+        self._jpeg_seq = -1
+        self._encoding_seq = -1
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        preview = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == '/':
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/html')
+                    self.send_header('Content-Length', str(len(_INDEX)))
+                    self.end_headers()
+                    self.wfile.write(_INDEX)
+                elif self.path.startswith('/stream'):
+                    preview._stream(self)
+                else:
+                    self.send_error(404)
+
+        self._server = _ThreadingHTTPServer((self.host, self.port), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._cond:
+            self._cond.notify_all()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    def update(self, frame, result=None):
+        """Publish a new frame (and the runner response to draw), this never encodes.
+
+        The frame must not be modified afterwards, pass a copy if it will be reused.
+        """
+        with self._cond:
+            self.stats['updates'] += 1
+            if self.clients == 0:
+                return
+            self._frame = frame
+            self._result = result
+            self._seq += 1
+            self._cond.notify_all()
+
+    def _encode(self, frame, result):
+        """Annotate and JPEG-encode a frame, called without the lock so update() never waits on it."""
+        img = frame.copy()
+        draw_result(img, result, (0, 0, 255) if self.bgr else (255, 0, 0))
+        if not self.bgr and img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+        ok, jpeg = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+        return jpeg.tobytes() if ok else None
+
+    def _jpeg_for(self, seq, frame, result):
+        """Return the JPEG for frame seq, encoding it only if no other client did (or does) already."""
+        with self._cond:
+            # another client is encoding this frame, wait for its result
+            while self._encoding_seq == seq and self._jpeg_seq != seq and self._server:
+                self._cond.wait(timeout=1.0)
+            if self._jpeg_seq == seq:
+                return self._jpeg
+            self._encoding_seq = seq
+
+        jpeg = None
+        try:
+            jpeg = self._encode(frame, result)
+        finally:
+            with self._cond:
+                if seq > self._jpeg_seq:
+                    self._jpeg = jpeg
+                    self._jpeg_seq = seq
+                    self.stats['encoded'] += 1
+                if self._encoding_seq == seq:
+                    self._encoding_seq = -1
+                self._cond.notify_all()
+        return jpeg
+
+    def _stream(self, handler):
+        handler.send_response(200)
+        handler.send_header('Cache-Control', 'no-cache')
+        handler.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=' + BOUNDARY)
+        handler.end_headers()
+
+        interval = 1.0 / self.fps if self.fps > 0 else 0.0
+        last_seq = -1
+        with self._cond:
+            self.clients += 1
+        try:
+            while self._server:
+                started = time.monotonic()
+                with self._cond:
+                    ready = lambda: (self._frame is not None and self._seq != last_seq) or not self._server
+                    if not self._cond.wait_for(ready, timeout=1.0):
+                        continue
+                    if not self._server:
+                        break
+                    last_seq = self._seq
+                    frame, result = self._frame, self._result
+                jpeg = self._jpeg_for(last_seq, frame, result)
+                if jpeg is None:
+                    continue
+
+                handler.wfile.write(('--%s\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n'
+                                     % (BOUNDARY, len(jpeg))).encode('ascii'))
+                handler.wfile.write(jpeg)
+                handler.wfile.write(b'\r\n')
+
+                remaining = interval - (time.monotonic() - started)
+                if remaining > 0:
+                    time.sleep(remaining)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self._cond:
+                self.clients -= 1
+                if self.clients == 0:
+                    self._frame = None
+                    self._result = None
@@ -0,0 +1,215 @@
+"""Record a live session's inputs and runner responses, and replay them against a model.
+
+A session log is a directory of chunk files (chunk-00000.eil, ...). Each chunk is a sequence
+of records: a fixed binary header, the raw input array and the runner response. Logs are
+read through mmap, so inputs are returned as zero-copy numpy views.
+
+    python -m edge_impulse_linux.record <log_dir> <model.eim> [--max-speed]
+
+replays a log and compares latency and results with the recording.
+"""
+import argparse
+import collections
+import glob
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import numpy as np
+
+# magic, kind, dtype code, ndim, seq, timestamp (s since start), latency (ms), shape (3 dims), input bytes, response bytes
+RECORD_HEADER = struct.Struct('<4sBBBxIdd3III')
+RECORD_MAGIC = b'EIRC'
+KIND_FEATURES = 0
+KIND_IMAGE = 1
+KIND_AUDIO = 2
+DTYPES = [ np.dtype(t) for t in ('uint8', 'int16', 'int32', 'int64', 'float32', 'float64') ]
+CHUNK_BYTES = 64 * 1024 * 1024
+
+Record = collections.namedtuple('Record', [ 'seq', 'kind', 'timestamp', 'latency_ms', 'data', 'response' ])
+
+
+def chunk_path(path, ix):
+    return os.path.join(path, 'chunk-%05d.eil' % ix)
+
+
+class SessionRecorder:
+    """Appends records to a session log, starting a new chunk file every chunk_bytes."""
+    def __init__(self, path, chunk_bytes=CHUNK_BYTES):
+        if os.path.exists(path) and os.listdir(path):
+            raise Exception('Session log directory is not empty: ' + path)
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.chunk_bytes = chunk_bytes
+        self._chunk = -1
+        self._file = None
+        self._seq = 0
+        self._started = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def record(self, data, response, kind=KIND_FEATURES, timestamp=None, latency_ms=0):
+        """Record one input (a feature list, an RGB frame or an audio window) and its response."""
+        arr = np.ascontiguousarray(data)
+        if arr.dtype not in DTYPES:
+            arr = arr.astype(np.float32 if arr.dtype.kind == 'f' else np.int64)
+        if arr.ndim > 3:
+            raise Exception('Inputs can have at most 3 dimensions, got shape ' + str(arr.shape))
+        shape = tuple(arr.shape) + (0,) * (3 - arr.ndim)
+        body = json.dumps(response, separators=(',', ':')).encode('utf-8')
+        if timestamp is None:
+            timestamp = time.monotonic() - self._started
+
+        size = RECORD_HEADER.size + arr.nbytes + len(body)
+        if self._file is None or self._file.tell() + size > self.chunk_bytes:
+            self.close()
+            self._chunk += 1
+            self._file = open(chunk_path(self.path, self._chunk), 'wb')
+
+        self._file.write(RECORD_HEADER.pack(RECORD_MAGIC, kind, DTYPES.index(arr.dtype), arr.ndim, self._seq,
+                                            timestamp, latency_ms, shape[0], shape[1], shape[2],
+                                            arr.nbytes, len(body)))
+        if arr.nbytes:
+            self._file.write(memoryview(arr).cast('B'))
+        self._file.write(body)
+        self._seq += 1
+
+
+class RecordingRunner:
+    """Wraps a runner so every classify call is recorded with its latency."""
+    def __init__(self, runner, recorder, kind=KIND_FEATURES):
+        self.runner = runner
+        self.recorder = recorder
+        self.kind = kind
+
+    def __getattr__(self, name):
+        return getattr(self.runner, name)
+
+    def classify(self, data):
+        started = time.monotonic()
+        res = self.runner.classify(data)
+        self.recorder.record(data, res, self.kind, latency_ms=(time.monotonic() - started) * 1000)
+        return res
+
+
+class SessionLog:
+    """Memory-maps every chunk of a session log and indexes its records."""
+    def __init__(self, path):
+        self._maps = []
+        self._index = []
+        for name in sorted(glob.glob(os.path.join(path, 'chunk-*.eil'))):
+            with open(name, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    continue
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps.append(mm)
+            offset = 0
+            while offset + RECORD_HEADER.size <= len(mm):
+                header = RECORD_HEADER.unpack_from(mm, offset)
+                end = offset + RECORD_HEADER.size + header[10] + header[11]
+                if header[0] != RECORD_MAGIC or end > len(mm):
+                    # a truncated last record, e.g. when the recording process was killed
+                    break
+                self._index.append((len(self._maps) - 1, offset, header))
+                offset = end
+        if not self._index:
+            raise Exception('No records found in ' + path)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, ix):
+        chunk, offset, (magic, kind, dtype, ndim, seq, timestamp, latency_ms, d0, d1, d2, nbytes, nresp) = self._index[ix]
+        mm = self._maps[chunk]
+        start = offset + RECORD_HEADER.size
+        shape = (d0, d1, d2)[:ndim]
+        data = np.frombuffer(mm, dtype=DTYPES[dtype], count=nbytes // DTYPES[dtype].itemsize, offset=start).reshape(shape)
+        response = json.loads(mm[start + nbytes:start + nbytes + nresp].decode('utf-8'))
+        return Record(seq, kind, timestamp, latency_ms, data, response)
+
+    def __iter__(self):
+        for ix in range(len(self)):
+            yield self[ix]
+
+    def close(self):
+        # views into the maps must be dropped before this is called
+        for mm in self._maps:
+            mm.close()
+        self._maps = []
+
+
+def replay(log, runner, speed=1.0):
+    """Classify every record of a SessionLog again, yielding (record, res, latency_ms).
+
+    speed=1.0 replays at the recorded pace, 2.0 twice as fast and None as fast as possible.
+    Image records are preprocessed with the runner's studio settings before classifying.
+    """
+    started = time.monotonic()
+    first = None
+    for record in log:
+        if speed:
+            if first is None:
+                first = record.timestamp
+            delay = (record.timestamp - first) / speed - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+        classify_started = time.monotonic()
+        if record.kind == KIND_IMAGE:
+            features, cropped = runner.get_features_from_image_auto_studio_settings(record.data)
+        else:
+            features = record.data.tolist()
+        res = runner.classify(features)
+        yield record, res, (time.monotonic() - classify_started) * 1000
+
+
+def _percentiles(values):
+    values = np.asarray(values)
+    return 'mean %.1f ms, p50 %.1f ms, p99 %.1f ms' % (values.mean(), np.percentile(values, 50), np.percentile(values, 99))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Replay a recorded session against a model')
+    parser.add_argument('log', help='Session log directory')
+    parser.add_argument('model', help='Path to the .eim model file')
+    parser.add_argument('--max-speed', action='store_true', help='Replay as fast as possible instead of at the recorded pace')
+    args = parser.parse_args(argv)
+
+    from edge_impulse_linux.image import ImageImpulseRunner
+    from edge_impulse_linux.runner import ImpulseRunner
+
+    log = SessionLog(args.log)
+    has_images = any(header[1] == KIND_IMAGE for chunk, offset, header in log._index)
+    runner = (ImageImpulseRunner if has_images else ImpulseRunner)(os.path.abspath(args.model))
+    try:
+        model_info = runner.init()
+        print('Replaying ' + str(len(log)) + ' records against "' + model_info['project']['owner'] + ' / ' +
+              model_info['project']['name'] + '"', flush=True)
+
+        recorded, replayed, changed = [], [], 0
+        for record, res, latency_ms in replay(log, runner, None if args.max_speed else 1.0):
+            recorded.append(record.latency_ms)
+            replayed.append(latency_ms)
+            if res.get('result') != record.response.get('result'):
+                changed += 1
+
+        print('Recorded: ' + _percentiles(recorded))
+        print('Replayed: ' + _percentiles(replayed))
+        print('Results changed: ' + str(changed) + ' of ' + str(len(log)))
+    finally:
+        runner.stop()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
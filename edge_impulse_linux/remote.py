@@ -0,0 +1,102 @@
+import json
+import socket
+import struct
+import threading
+import numpy as np
+from edge_impulse_linux.runner import ImpulseRunner
+
+# Binary framing used between RemoteImpulseRunner and edge_impulse_linux.serve:
+# every message is a 16-byte header followed by `length` payload bytes.
+#   request:  magic b'EIRQ', op, request id, length, payload = raw little-endian float32 features
+#   response: magic b'EIRS', status, request id, length, payload = JSON runner response
+FRAME_HEADER = struct.Struct('<4sB3xII')
+REQUEST_MAGIC = b'EIRQ'
+RESPONSE_MAGIC = b'EIRS'
+OP_HELLO = 1
+OP_CLASSIFY = 2
+STATUS_OK = 0
+STATUS_ERROR = 1
+DEFAULT_SOCKET = '/tmp/edge-impulse-runner.sock'
+
+
+def recv_exact(sock, n, buf=None):
+    """Read exactly n bytes from sock (into buf if given), returns None on EOF."""
+    buf = bytearray(n) if buf is None else buf
+    view = memoryview(buf)[:n]
+    received = 0
+    while received < n:
+        chunk = sock.recv_into(view[received:], n - received)
+        if chunk == 0:
+            return None
+        received += chunk
+    return buf
+
+
+def send_frame(sock, magic, op, ix, payload=b''):
+    sock.sendall(FRAME_HEADER.pack(magic, op, ix, len(payload)) + bytes(payload))
+
+
+class RemoteImpulseRunner:
+    """Drop-in replacement for ImpulseRunner that classifies on a shared
+    `python -m edge_impulse_linux.serve` process instead of starting its own model."""
+    def __init__(self, socket_path: str = DEFAULT_SOCKET):
+        self._socket_path = socket_path
+        self._client = None
+        self._ix = 0
+        self._lock = threading.Lock()
+        self.ready = False
+        self.warmup_stats = None
+
+    def init(self, debug=False, warmup=0, **kwargs):
+        """Connect and say hello. warmup=N runs N dummy inferences through the server like
+        ImpulseRunner.init does; debug and the log options belong to the server process and
+        are ignored here."""
+        self.ready = False
+        self._client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._client.connect(self._socket_path)
+        model_info = self.hello()
+        if warmup > 0:
+            model_info['warmup'] = self.warmup(model_info, warmup)
+        self.ready = True
+        return model_info
+
+    # same dummy inputs and cold/warm reporting as a local runner
+    warmup = ImpulseRunner.warmup
+
+    def stop(self):
+        self.ready = False
+        if self._client:
+            self._client.close()
+            self._client = None
+
+    def hello(self):
+        return self._request(OP_HELLO, b'')
+
+    def classify(self, data):
+        features = np.asarray(data, dtype='<f4')
+        return self._request(OP_CLASSIFY, features.tobytes())
+
+    def _request(self, op, payload):
+        if not self._client:
+            raise Exception("RemoteImpulseRunner is not initialized (call init())")
+
+        with self._lock:
+            self._ix = (self._ix + 1) & 0xffffffff
+            ix = self._ix
+            send_frame(self._client, REQUEST_MAGIC, op, ix, payload)
+
+            header = recv_exact(self._client, FRAME_HEADER.size)
+            if header is None:
+                raise Exception("Inference server closed the connection")
+            magic, status, resp_ix, length = FRAME_HEADER.unpack(header)
+            body = recv_exact(self._client, length) if length else b''
+            if magic != RESPONSE_MAGIC or body is None:
+                raise Exception("No data or corrupted data received")
+
+        if resp_ix != ix:
+            raise Exception("Wrong id, expected: " + str(ix) + " but got " + str(resp_ix))
+
+        resp = json.loads(bytes(body).decode('utf-8'))
+        if status != STATUS_OK:
+            raise Exception(resp.get('error', 'Unknown error'))
+        return resp
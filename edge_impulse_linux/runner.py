@@ -6,12 +6,61 @@ import time
 import signal
 import socket
 import json
+import threading
+import logging
+from collections import deque
+
+LOG_LINES = 200
+ERROR_TAIL_LINES = 20
 
 
 def now():
     return round(time.time() * 1000)
 
 
+class LogDrainer:
+    """Keeps reading a runner's stdout/stderr so the model never blocks on a full pipe.
+
+    The last max_lines lines are kept in a ring buffer (see tail()), and can
+    optionally be forwarded to a logging.Logger (stdout at INFO, stderr at WARNING).
+    """
+    def __init__(self, stdout, stderr, max_lines=LOG_LINES, logger=None):
+        self.lines = deque(maxlen=max_lines)
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._drain, args=(pipe, name, level), daemon=True)
+            for pipe, name, level in ((stdout, "stdout", logging.INFO), (stderr, "stderr", logging.WARNING))
+            if pipe is not None
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _drain(self, pipe, name, level):
+        try:
+            for raw in iter(pipe.readline, b""):
+                line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                with self._lock:
+                    self.lines.append(line)
+                if self.logger:
+                    self.logger.log(level, "[%s] %s", name, line)
+        except (OSError, ValueError):
+            pass
+        finally:
+            pipe.close()
+
+    def tail(self, n=None):
+        with self._lock:
+            lines = list(self.lines)
+        if n is not None:
+            lines = lines[-n:]
+        return "\n".join(lines)
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+
 class ImpulseRunner:
     def __init__(self, model_path: str):
         self._model_path = model_path
@@ -20,8 +69,23 @@ class ImpulseRunner:
         self._client = None
         self._ix = 0
         self._debug = False
+        self._logs = None
+        self.ready = False
+        self.warmup_stats = None
+
+    def init(self, debug=False, log_lines=LOG_LINES, logger=None, warmup=0):
+        """Start the model and say hello.
 
-    def init(self, debug=False):
+        Without debug the model's stdout/stderr are drained in the background: the last
+        log_lines lines are kept (see log_tail()) and attached to errors when the model
+        crashes, pass a logging.Logger as logger to forward them as well.
+
+        With warmup=N the model first classifies N dummy inputs, so the slow first
+        inference doesn't hit real data; the cold and warm timings end up in
+        warmup_stats and model_info['warmup']. ready is only set once the model info
+        has been checked by the subclass (see _load_model_info) and after the warm-up.
+        """
+        self.ready = False
         if not os.path.exists(self._model_path):
             raise Exception("Model file does not exist: " + self._model_path)
 
@@ -40,19 +104,55 @@ class ImpulseRunner:
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
             )
+            self._logs = LogDrainer(self._runner.stdout, self._runner.stderr, log_lines, logger)
 
-        while not os.path.exists(socket_path) or self._runner.poll() is not None:
+        while not os.path.exists(socket_path) and self._runner.poll() is None:
             time.sleep(0.1)
 
         if self._runner.poll() is not None:
-            raise Exception("Failed to start runner (" + str(self._runner.poll()) + ")")
+            raise self._runner_error("Failed to start runner (" + str(self._runner.poll()) + ")")
 
         self._client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         self._client.connect(socket_path)
 
-        return self.hello()
+        model_info = self.hello()
+        self._load_model_info(model_info)
+        if warmup > 0:
+            model_info['warmup'] = self.warmup(model_info, warmup)
+        self.ready = True
+        return model_info
+
+    def _load_model_info(self, model_info):
+        # subclasses check the model suits them and read its parameters here, before warm-up
+        pass
+
+    def warmup(self, model_info, runs):
+        """Classify runs dummy inputs shaped after model_info['model_parameters'],
+        returns the cold (first) and warm (median of the rest) latency in ms."""
+        params = model_info['model_parameters']
+        if params.get('image_input_width', 0) > 0:
+            # one packed mid-grey pixel per input pixel, (P << 16) + (P << 8) + P also covers grayscale
+            features = [0x808080] * (params['image_input_width'] * params['image_input_height'])
+        else:
+            features = [0] * params['input_features_count']
+
+        timings = []
+        for _ in range(runs):
+            started = time.monotonic()
+            self.classify(features)
+            timings.append((time.monotonic() - started) * 1000)
+
+        warm = sorted(timings[1:])
+        self.warmup_stats = {
+            'runs': runs,
+            'cold_ms': timings[0],
+            'warm_ms': warm[len(warm) // 2] if warm else None,
+            'timings_ms': timings,
+        }
+        return self.warmup_stats
 
     def stop(self):
+        self.ready = False
         if self._tempdir:
             shutil.rmtree(self._tempdir)
 
@@ -63,6 +163,21 @@ class ImpulseRunner:
             os.kill(self._runner.pid, signal.SIGINT)
             # todo: in Node we send a SIGHUP after 0.5sec if process has not died, can we do this somehow here too?
 
+    def log_tail(self, n=None):
+        """The last lines the model wrote to stdout/stderr (empty in debug mode)."""
+        return self._logs.tail(n) if self._logs else ""
+
+    def _runner_error(self, message):
+        """Build an exception for a failed or crashed model, with the tail of its output attached."""
+        if self._logs:
+            # give the drain threads a moment to pick up the last words of the process
+            if self._runner and self._runner.poll() is not None:
+                self._logs.join(0.5)
+            tail = self._logs.tail(ERROR_TAIL_LINES)
+            if tail:
+                message = message + "\nLast output from the model:\n" + tail
+        return Exception(message)
+
     def hello(self):
         msg = {"hello": 1}
         return self.send_msg(msg)
@@ -83,13 +198,23 @@ class ImpulseRunner:
         ix = self._ix
 
         msg["id"] = ix
-        self._client.send(json.dumps(msg).encode("utf-8"))
+        try:
+            self._client.send(json.dumps(msg).encode("utf-8"))
+        except OSError as e:
+            raise self._runner_error("Failed to send to runner (" + str(e) + ")")
 
         t_sent_msg = now()
 
         data = b""
         while True:
-            chunk = self._client.recv(1024)
+            try:
+                chunk = self._client.recv(1024)
+            except OSError as e:
+                raise self._runner_error("Failed to receive from runner (" + str(e) + ")")
+            if not chunk:
+                code = self._runner.poll() if self._runner else None
+                raise self._runner_error("Runner closed the connection" +
+                                         (" (exited with " + str(code) + ")" if code is not None else ""))
             # end chunk has \x00 in the end
             if chunk[-1] == 0:
                 data = data + chunk[:-1]
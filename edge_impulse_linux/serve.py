@@ -0,0 +1,123 @@
+"""Local inference server sharing one pool of runners between many client processes.
+
+    python -m edge_impulse_linux.serve model.eim [--socket PATH] [--runners N]
+
+Clients connect with edge_impulse_linux.remote.RemoteImpulseRunner. Requests from all
+connections are scheduled on whichever runner is idle, so requests pipelined by several
+clients run on several runners at the same time.
+"""
+import argparse
+import json
+import os
+import queue
+import signal
+import socketserver
+import sys
+import threading
+import numpy as np
+from edge_impulse_linux.pool import RunnerPool
+from edge_impulse_linux.remote import (FRAME_HEADER, REQUEST_MAGIC, RESPONSE_MAGIC, OP_HELLO, OP_CLASSIFY,
+                                       STATUS_OK, STATUS_ERROR, DEFAULT_SOCKET, recv_exact, send_frame)
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, pool, model_info):
+        self.pool = pool
+        self.model_info = model_info
+        self.stats = { 'requests': 0, 'errors': 0, 'connections': 0 }
+        self.stats_lock = threading.Lock()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super(InferenceServer, self).__init__(socket_path, _Handler)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        with server.stats_lock:
+            server.stats['connections'] += 1
+        # responses are written by one thread per connection, so the pool's threads never block
+        # on a slow client: completed classifications only queue (ix, future) here
+        responses = queue.Queue()
+        writer = threading.Thread(target=self._write, args=(responses,), daemon=True)
+        writer.start()
+        header = bytearray(FRAME_HEADER.size)
+
+        try:
+            while True:
+                if recv_exact(self.request, FRAME_HEADER.size, header) is None:
+                    return
+                magic, op, ix, length = FRAME_HEADER.unpack(header)
+                payload = recv_exact(self.request, length) if length else bytearray()
+                if magic != REQUEST_MAGIC or payload is None:
+                    return
+
+                with server.stats_lock:
+                    server.stats['requests'] += 1
+                if op == OP_HELLO:
+                    responses.put((ix, STATUS_OK, server.model_info))
+                elif op == OP_CLASSIFY:
+                    features = np.frombuffer(payload, dtype='<f4').tolist()
+                    future = server.pool.classify(features)
+                    future.add_done_callback(lambda f, ix=ix: responses.put((ix, None, f)))
+                else:
+                    responses.put((ix, STATUS_ERROR, { 'error': 'Unknown op ' + str(op) }))
+        finally:
+            responses.put(None)
+            writer.join()
+
+    def _write(self, responses):
+        server = self.server
+        connected = True
+        while True:
+            item = responses.get()
+            if item is None:
+                return
+            ix, status, resp = item
+            if status is None:
+                try:
+                    status, resp = STATUS_OK, resp.result()
+                except Exception as e:
+                    with server.stats_lock:
+                        server.stats['errors'] += 1
+                    status, resp = STATUS_ERROR, { 'error': str(e) }
+            if not connected:
+                continue
+            try:
+                send_frame(self.request, RESPONSE_MAGIC, status, ix, json.dumps(resp).encode('utf-8'))
+            except OSError:
+                connected = False
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Serve an Edge Impulse model to local clients over a Unix socket')
+    parser.add_argument('model', help='Path to the .eim model file')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help='Unix socket to listen on (default: %(default)s)')
+    parser.add_argument('--runners', type=int, default=2, help='Number of model processes (default: %(default)s)')
+    parser.add_argument('--warmup', type=int, default=0, help='Dummy inferences per runner before serving (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    pool = RunnerPool(os.path.abspath(args.model), args.runners)
+    model_info = pool.init(warmup=args.warmup)
+    server = InferenceServer(args.socket, pool, model_info)
+    print('Serving "' + model_info['project']['owner'] + ' / ' + model_info['project']['name'] + '" with ' +
+          str(args.runners) + ' runner(s) on ' + args.socket, flush=True)
+
+    def shutdown(sig, frame):
+        threading.Thread(target=server.shutdown).start()
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        pool.stop()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
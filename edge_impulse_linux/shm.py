@@ -0,0 +1,219 @@
+import json
+import struct
+import time
+from collections import namedtuple
+import numpy as np
+
+# Layout of the shared memory segment:
+#   header (64 bytes): magic, version, slots, height, width, channels, dtype,
+#                      result capacity, write count
+#   slots:  slot header (32 bytes): seq, frame id, timestamp, result length
+#           frame bytes, result bytes (JSON), padded to 64 bytes
+# Every slot is protected by a seqlock: seq is odd while the slot is being written,
+# a reader that sees the same even seq before and after reading got a consistent copy.
+MAGIC = b'EISF'
+VERSION = 1
+HEADER = struct.Struct('<4sIIIII4sI')
+HEADER_SIZE = 64
+WRITE_COUNT_OFFSET = 32
+SLOT_HEADER = struct.Struct('<QQdI')
+SLOT_HEADER_SIZE = 32
+
+SharedFrame = namedtuple('SharedFrame', ['frame', 'result', 'frame_id', 'timestamp', 'slot', 'seq'])
+
+
+def _slot_stride(frame_bytes, result_capacity):
+    size = SLOT_HEADER_SIZE + frame_bytes + result_capacity
+    return (size + 63) // 64 * 64
+
+
+# segments published by this process (or, after a fork, by its parent)
+_published = set()
+
+
+def _attach(name):
+    # multiprocessing.shared_memory needs Python 3.8+
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before 3.13 every process that attaches registers the segment with its
+        # resource tracker, which would unlink it when the reader exits
+        shm = shared_memory.SharedMemory(name=name)
+        if name in _published:
+            # the publisher's process (or a forked child) shares its resource tracker,
+            # unregistering here would make the publisher's unlink() fail in the tracker
+            return shm
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+        return shm
+
+
+class SharedFramePublisher():
+    """Publishes frames and their latest result into a shared memory ring of fixed-size slots.
+
+    Other local processes read them with SharedFrameReader, without JPEG encoding or
+    filesystem I/O. The segment is created on construction and removed by close(). A segment
+    left behind under the same name (e.g. by a publisher that was killed) is replaced.
+    """
+    def __init__(self, name, shape, dtype=np.uint8, slots=4, result_capacity=16384):
+        from multiprocessing import shared_memory
+        shape = tuple(shape)
+        if len(shape) == 2:
+            shape = shape + (1,)
+        self.name = name
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self.result_capacity = result_capacity
+        self.frame_bytes = int(np.prod(shape)) * self.dtype.itemsize
+        self.stride = _slot_stride(self.frame_bytes, result_capacity)
+        self.frame_id = 0
+
+        size = HEADER_SIZE + self.stride * slots
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _published.add(name)
+        buf = self._shm.buf
+        buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        HEADER.pack_into(buf, 0, MAGIC, VERSION, slots, shape[0], shape[1], shape[2],
+                         self.dtype.str.encode('ascii').ljust(4), result_capacity)
+        self._frames = [
+            np.ndarray(shape, dtype=self.dtype, buffer=buf, offset=HEADER_SIZE + i * self.stride + SLOT_HEADER_SIZE)
+            for i in range(slots)
+        ]
+        for i in range(slots):
+            SLOT_HEADER.pack_into(buf, HEADER_SIZE + i * self.stride, 0, 0, 0.0, 0)
+
+    def publish(self, frame, result=None):
+        """Copy frame (and result, JSON-serialisable) into the next slot, returns the frame id."""
+        frame = np.asarray(frame)
+        if frame.size * frame.itemsize != self.frame_bytes or frame.dtype != self.dtype:
+            raise Exception('Frame ' + str(frame.shape) + ' ' + str(frame.dtype) + ' does not match the shared memory layout '
+                            + str(self.shape) + ' ' + str(self.dtype))
+        payload = json.dumps(result).encode('utf-8') if result is not None else b''
+        if len(payload) > self.result_capacity:
+            raise Exception('Result is too large for the shared memory slot (' + str(len(payload)) + ' bytes)')
+
+        buf = self._shm.buf
+        self.frame_id += 1
+        slot = self.frame_id % self.slots
+        offset = HEADER_SIZE + slot * self.stride
+        seq = struct.unpack_from('<Q', buf, offset)[0]
+
+        struct.pack_into('<Q', buf, offset, seq + 1)     # odd: being written
+        np.copyto(self._frames[slot], frame.reshape(self.shape))
+        result_offset = offset + SLOT_HEADER_SIZE + self.frame_bytes
+        buf[result_offset:result_offset + len(payload)] = payload
+        SLOT_HEADER.pack_into(buf, offset, seq + 1, self.frame_id, time.time(), len(payload))
+        struct.pack_into('<Q', buf, offset, seq + 2)     # even: consistent again
+        struct.pack_into('<Q', buf, WRITE_COUNT_OFFSET, self.frame_id)
+        return self.frame_id
+
+    def close(self):
+        if self._shm:
+            self._frames = []
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+            _published.discard(self.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+class SharedFrameReader():
+    """Reads the newest frame published by a SharedFramePublisher in another process."""
+    def __init__(self, name):
+        self.name = name
+        self._shm = _attach(name)
+        buf = self._shm.buf
+        magic, version, slots, height, width, channels, dtype, result_capacity = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise Exception('Shared memory "' + name + '" is not an Edge Impulse frame ring')
+        self.slots = slots
+        self.shape = (height, width, channels)
+        self.dtype = np.dtype(dtype.decode('ascii').strip())
+        self.result_capacity = result_capacity
+        self.frame_bytes = height * width * channels * self.dtype.itemsize
+        self.stride = _slot_stride(self.frame_bytes, result_capacity)
+        self._frames = [
+            np.ndarray(self.shape, dtype=self.dtype, buffer=buf, offset=HEADER_SIZE + i * self.stride + SLOT_HEADER_SIZE)
+            for i in range(slots)
+        ]
+
+    def latest_id(self):
+        """Id of the newest published frame, 0 if nothing was published yet."""
+        return struct.unpack_from('<Q', self._shm.buf, WRITE_COUNT_OFFSET)[0]
+
+    def read(self, copy=True, out=None, retries=10):
+        """Return the newest frame as a SharedFrame, or None if there is none (yet).
+
+        With copy=True the frame is copied (into out if given) and guaranteed consistent.
+        With copy=False the frame is a view into shared memory: it stays valid only as long
+        as is_current() returns True, check that after using it.
+        """
+        buf = self._shm.buf
+        for _ in range(retries):
+            frame_id = self.latest_id()
+            if frame_id == 0:
+                return None
+            slot = frame_id % self.slots
+            offset = HEADER_SIZE + slot * self.stride
+            seq, slot_frame_id, timestamp, result_len = SLOT_HEADER.unpack_from(buf, offset)
+            if seq & 1:
+                continue
+
+            frame = self._frames[slot]
+            if copy:
+                if out is None:
+                    out = np.empty(self.shape, dtype=self.dtype)
+                np.copyto(out, frame)
+                frame = out
+            result_offset = offset + SLOT_HEADER_SIZE + self.frame_bytes
+            payload = bytes(buf[result_offset:result_offset + result_len])
+
+            if struct.unpack_from('<Q', buf, offset)[0] != seq:
+                continue
+            result = json.loads(payload.decode('utf-8')) if payload else None
+            return SharedFrame(frame, result, slot_frame_id, timestamp, slot, seq)
+        return None
+
+    def is_current(self, shared_frame):
+        """True if the slot behind a (zero-copy) SharedFrame has not been overwritten."""
+        offset = HEADER_SIZE + shared_frame.slot * self.stride
+        return struct.unpack_from('<Q', self._shm.buf, offset)[0] == shared_frame.seq
+
+    def wait(self, last_id=0, timeout=None, poll=0.002):
+        """Block until a frame newer than last_id is published, returns its id or None on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            frame_id = self.latest_id()
+            if frame_id > last_id:
+                return frame_id
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(poll)
+
+    def close(self):
+        if self._shm:
+            self._frames = []
+            self._shm.close()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
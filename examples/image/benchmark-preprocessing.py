@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+# Micro-benchmark for the image preprocessing in edge_impulse_linux.image. Reports the median
+# time per frame, the peak numpy allocations (tracemalloc) and a checksum of the output for
+# every combination of function, frame size, model size and colour mode. Write the checksums
+# with --write-golden before an optimization and compare with --check-golden after it, so
+# changes to the features can't go unnoticed.
+
+import sys, getopt
+import hashlib
+import json
+import time
+import tracemalloc
+import numpy as np
+from edge_impulse_linux.image import (ImageImpulseRunner, get_features_from_image_with_studio_mode,
+                                      resize_with_letterbox)
+
+FRAME_SIZES = [ (640, 480), (1280, 720), (1920, 1080), (3840, 2160) ]
+MODEL_DIMS = [ 96, 160, 320, 640 ]
+QUICK_FRAME_SIZES = [ (640, 480), (1920, 1080) ]
+QUICK_MODEL_DIMS = [ 96, 320 ]
+
+def help():
+    print('python benchmark-preprocessing.py [--quick] [--repeat <n>] [--filter <text>] [--write-golden <file.json>] [--check-golden <file.json>]')
+
+def synthetic_frame(width, height, seed=0):
+    # horizontal and vertical gradients plus deterministic noise, so every resize mode
+    # produces distinct output, generated in a few vectorized passes
+    rng = np.random.default_rng(seed)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:, :, 0] = (np.arange(height) * (255.0 / height)).astype(np.uint8)[:, None]
+    frame[:, :, 1] = (np.arange(width) * (255.0 / width)).astype(np.uint8)[None, :]
+    frame[:, :, 2] = rng.integers(0, 256, (height, width), dtype=np.uint8)
+    return frame
+
+def checksum(output):
+    return hashlib.sha256(np.ascontiguousarray(np.asarray(output, dtype=np.int64)).tobytes()).hexdigest()[:16]
+
+def cases(frame_sizes, model_dims):
+    runner = ImageImpulseRunner('')
+    for (fw, fh) in frame_sizes:
+        for dim in model_dims:
+            for grayscale in (False, True):
+                color = 'gray' if grayscale else 'rgb'
+
+                def features_from_image(img, dim=dim, grayscale=grayscale):
+                    runner.dim = (dim, dim)
+                    runner.isGrayscale = grayscale
+                    return runner.get_features_from_image(img)[0]
+                yield 'get_features_from_image', fw, fh, dim, color, features_from_image
+
+                for mode in ('fit-shortest', 'fit-longest', 'squash'):
+                    def studio_mode(img, mode=mode, dim=dim, grayscale=grayscale):
+                        return get_features_from_image_with_studio_mode(img, mode, dim, dim, grayscale)[0]
+                    yield mode, fw, fh, dim, color, studio_mode
+
+                if not grayscale:
+                    # resize_with_letterbox doesn't grayscale, so it only runs once per size
+                    def letterbox(img, dim=dim):
+                        return resize_with_letterbox(img, dim, dim)
+                    yield 'resize_with_letterbox', fw, fh, dim, color, letterbox
+
+def run_case(fn, frame, repeat):
+    output = fn(frame)     # warm up caches (lru_cache'd geometry, OpenCV buffers)
+
+    tracemalloc.start()
+    fn(frame)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(frame)
+        timings.append((time.perf_counter() - started) * 1000)
+    return np.median(timings), peak, checksum(output)
+
+def main(argv):
+    try:
+        opts, args = getopt.getopt(argv, "h", ["help", "quick", "repeat=", "filter=", "write-golden=", "check-golden="])
+    except getopt.GetoptError:
+        help()
+        sys.exit(2)
+
+    frame_sizes, model_dims = FRAME_SIZES, MODEL_DIMS
+    repeat = 5
+    name_filter = None
+    write_golden = None
+    golden = None
+
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            help()
+            sys.exit()
+        elif opt == '--quick':
+            frame_sizes, model_dims = QUICK_FRAME_SIZES, QUICK_MODEL_DIMS
+        elif opt == '--repeat':
+            repeat = int(arg)
+        elif opt == '--filter':
+            name_filter = arg
+        elif opt == '--write-golden':
+            write_golden = arg
+        elif opt == '--check-golden':
+            with open(arg, 'r') as f:
+                golden = json.load(f)
+
+    frames = {}
+    checksums = {}
+    mismatches = 0
+
+    print('%-24s %-10s %-8s %-5s %10s %10s  %s' % ('function', 'frame', 'dims', 'color', 'ms/frame', 'peak KiB', 'checksum'))
+    for name, fw, fh, dim, color, fn in cases(frame_sizes, model_dims):
+        key = '%s %dx%d %dx%d %s' % (name, fw, fh, dim, dim, color)
+        if name_filter and name_filter not in key:
+            continue
+        if (fw, fh) not in frames:
+            frames[(fw, fh)] = synthetic_frame(fw, fh)
+
+        ms, peak, digest = run_case(fn, frames[(fw, fh)], repeat)
+        checksums[key] = digest
+
+        status = ''
+        if golden is not None:
+            if key not in golden:
+                status = ' (no golden)'
+            elif golden[key] != digest:
+                status = ' MISMATCH (golden ' + golden[key] + ')'
+                mismatches += 1
+        print('%-24s %-10s %-8s %-5s %10.2f %10.1f  %s%s' % (name, '%dx%d' % (fw, fh), '%dx%d' % (dim, dim), color,
+                                                            ms, peak / 1024, digest, status), flush=True)
+
+    if write_golden:
+        with open(write_golden, 'w') as f:
+            json.dump(checksums, f, indent=2, sort_keys=True)
+        print('Wrote %d checksums to %s' % (len(checksums), write_golden))
+
+    if mismatches:
+        print('%d outputs differ from the golden checksums' % mismatches)
+        sys.exit(1)
+
+if __name__ == "__main__":
+   main(sys.argv[1:])
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+import device_patches       # Device specific patches for Jetson Nano (needs to be before importing cv2)  # noqa: F401
+
+import cv2
+import os
+import sys
+import getopt
+from edge_impulse_linux.image import ImageImpulseRunner
+from edge_impulse_linux.cascade import Cascade, CascadeStage
+
+def help():
+    print('python classify-cascade.py [--label <gate_label>] [--min-score <score>] <path_to_gate_model.eim> <path_to_detector_model.eim> <path_to_video.mp4>')
+
+def main(argv):
+    try:
+        opts, args = getopt.getopt(argv, "h", ["help", "label=", "min-score="])
+    except getopt.GetoptError:
+        help()
+        sys.exit(2)
+
+    # the detector only runs on frames where the gate model scores this label above min_score
+    gate_labels = None
+    min_score = 0.6
+
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            help()
+            sys.exit()
+        elif opt == '--label':
+            gate_labels = [ arg ]
+        elif opt == '--min-score':
+            min_score = float(arg)
+
+    if len(args) != 3:
+        help()
+        sys.exit(2)
+
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    gate_file = os.path.join(dir_path, args[0])
+    detector_file = os.path.join(dir_path, args[1])
+
+    cascade = Cascade([
+        CascadeStage(ImageImpulseRunner(gate_file), 'gate', labels=gate_labels, min_score=min_score),
+        CascadeStage(ImageImpulseRunner(detector_file), 'detector'),
+    ])
+
+    try:
+        for model_info in cascade.init():
+            print('Loaded runner for "' + model_info['project']['owner'] + ' / ' + model_info['project']['name'] + '"')
+
+        vidcap = cv2.VideoCapture(args[2])
+        while True:
+            success, img = vidcap.read()
+            if not success:
+                break
+
+            res = cascade.classify(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+            if res['exit'] == 'detector' and "bounding_boxes" in res["result"].keys():
+                print('Found %d bounding boxes (%d ms.)' % (len(res["result"]["bounding_boxes"]), res['timing']['dsp'] + res['timing']['classification']))
+                for bb in res["result"]["bounding_boxes"]:
+                    print('\t%s (%.2f): x=%d y=%d w=%d h=%d' % (bb['label'], bb['value'], bb['x'], bb['y'], bb['width'], bb['height']))
+
+        for name, rates in cascade.hit_rates().items():
+            print('%s: reached by %.1f%% of frames, passed %.1f%%, %.1f ms. avg' % (name, rates['reached'] * 100, rates['passed'] * 100, rates['avg_ms']))
+    finally:
+        cascade.stop()
+
+if __name__ == "__main__":
+   main(sys.argv[1:])
@@ -8,6 +8,7 @@ import sys, getopt
 import signal
 import time
 from edge_impulse_linux.image import ImageImpulseRunner
+from edge_impulse_linux.governor import RateGovernor
 
 runner = None
 
@@ -92,11 +93,12 @@ def main(argv):
             else:
                 raise Exception("Couldn't initialize selected camera.")
 
-            next_frame = 0 # limit to ~10 fps here
+            # start at ~10 fps, and adapt the rate to keep both inferences under 200ms and CPU under 80%
+            governor = RateGovernor(latency_slo_ms=200, cpu_budget=80, start_fps=10)
 
             for img in runner.get_frames(videoCaptureDeviceId):
-                if (next_frame > now()):
-                    time.sleep((next_frame - now()) / 1000)
+                governor.wait()
+                started = now()
 
                 # make two cuts from the image, one on the left and one on the right
                 features_l, cropped_l = runner.get_features_from_image(img, 'left')
@@ -131,7 +133,9 @@ def main(argv):
                 print_classification(res_l, 'LEFT')
                 print_classification(res_r, 'RIGHT')
 
-                next_frame = now() + 100
+                decision = governor.record(now() - started)
+                if decision and decision['fps'] != decision['prev_fps']:
+                    print('Rate %.1f -> %.1f fps (%s)' % (decision['prev_fps'], decision['fps'], decision['reason']))
 
         finally:
             if (runner):
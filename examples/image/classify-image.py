@@ -7,6 +7,7 @@ import os
 import sys
 import getopt
 from edge_impulse_linux.image import ImageImpulseRunner
+from edge_impulse_linux.anomaly import grid_to_array, grid_to_heatmap, anomaly_boxes, anomaly_threshold
 
 runner = None
 
@@ -79,12 +80,17 @@ def main(argv):
                                                                                                             res['timing']['anomaly']))
                 for grid_cell in res["result"]["visual_anomaly_grid"]:
                     print('\t%s (%.2f): x=%d y=%d w=%d h=%d' % (grid_cell['label'], grid_cell['value'], grid_cell['x'], grid_cell['y'], grid_cell['width'], grid_cell['height']))
-                    cropped = cv2.rectangle(cropped, (grid_cell['x'], grid_cell['y']), (grid_cell['x'] + grid_cell['width'], grid_cell['y'] + grid_cell['height']), (255, 125, 0), 1)
-                values = [grid_cell['value'] for grid_cell in res["result"]["visual_anomaly_grid"]]
-                mean_value = sum(values) / len(values)
-                max_value = max(values)
-                print('Max value: %.2f' % max_value)
-                print('Mean value: %.2f' % mean_value)
+                cells = grid_to_array(res["result"]["visual_anomaly_grid"])
+                heatmap = grid_to_heatmap(cells, cropped.shape[1], cropped.shape[0])
+                # merge neighbouring cells scoring above the model's anomaly threshold into regions
+                threshold = anomaly_threshold(model_info)
+                boxes, scores = anomaly_boxes(heatmap, threshold)
+                for (x, y, w, h), score in zip(boxes.tolist(), scores.tolist()):
+                    print('\tanomalous region (%.2f): x=%d y=%d w=%d h=%d' % (score, x, y, w, h))
+                    cropped = cv2.rectangle(cropped, (x, y), (x + w, y + h), (255, 125, 0), 1)
+                if len(cells):
+                    print('Max value: %.2f' % cells[:, 4].max())
+                    print('Mean value: %.2f' % cells[:, 4].mean())
 
             # the image will be resized and cropped, save a copy of the picture here
             # so you can see what's being passed into the classifier
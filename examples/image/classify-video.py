@@ -8,6 +8,7 @@ import time
 import sys, getopt
 import numpy as np
 from edge_impulse_linux.image import ImageImpulseRunner
+from edge_impulse_linux.anomaly import grid_to_heatmap, overlay_heatmap, anomaly_threshold
 
 runner = None
 # if you don't want to see a video preview, set this to False
@@ -96,9 +97,9 @@ def main(argv):
                     print('Found %d visual anomalies (%d ms.)' % (len(res["result"]["visual_anomaly_grid"]), res['timing']['dsp'] +
                                                                                                                 res['timing']['classification'] +
                                                                                                                 res['timing']['anomaly']))
-                    for grid_cell in res["result"]["visual_anomaly_grid"]:
-                        print('\t%s (%.2f): x=%d y=%d w=%d h=%d' % (grid_cell['label'], grid_cell['value'], grid_cell['x'], grid_cell['y'], grid_cell['width'], grid_cell['height']))
-                        img = cv2.rectangle(cropped, (grid_cell['x'], grid_cell['y']), (grid_cell['x'] + grid_cell['width'], grid_cell['y'] + grid_cell['height']), (255, 125, 0), 1)
+                    heatmap = grid_to_heatmap(res["result"]["visual_anomaly_grid"], cropped.shape[1], cropped.shape[0])
+                    # only tint the cells the model considers anomalous
+                    overlay_heatmap(cropped, heatmap, anomaly_threshold(model_info))
 
                 if (show_camera):
                     cv2.imshow('edgeimpulse', cv2.cvtColor(cropped, cv2.COLOR_RGB2BGR))
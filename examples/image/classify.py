@@ -8,12 +8,17 @@ import sys, getopt
 import signal
 import time
 from edge_impulse_linux.image import ImageImpulseRunner
+from edge_impulse_linux.preview import PreviewServer
+from edge_impulse_linux.governor import RateGovernor
 
 runner = None
 # if you don't want to see a camera preview, set this to False
 show_camera = True
 if (sys.platform == 'linux' and not os.environ.get('DISPLAY')):
     show_camera = False
+# set to a port (e.g. 4912) to watch the results at http://localhost:<port>/ instead,
+# frames are only encoded while a browser is connected
+preview_port = 0
 
 def now():
     return round(time.time() * 1000)
@@ -70,9 +75,11 @@ def main(argv):
 
     with ImageImpulseRunner(modelfile) as runner:
         try:
-            model_info = runner.init()
+            # run a few dummy inferences first, so the slow first inference doesn't hit a camera frame
+            model_info = runner.init(warmup=3)
             # model_info = runner.init(debug=True) # to get debug print out
             print('Loaded runner for "' + model_info['project']['owner'] + ' / ' + model_info['project']['name'] + '"')
+            print('Warm-up: first inference %d ms., then %d ms.' % (model_info['warmup']['cold_ms'], model_info['warmup']['warm_ms']))
             labels = model_info['model_parameters']['labels']
             if len(args)>= 2:
                 videoCaptureDeviceId = int(args[1])
@@ -95,12 +102,15 @@ def main(argv):
             else:
                 raise Exception("Couldn't initialize selected camera.")
 
-            next_frame = 0 # limit to ~10 fps here
+            preview = PreviewServer(preview_port).start() if preview_port else None
 
-            for res, img in runner.classifier(videoCaptureDeviceId):
-                if (next_frame > now()):
-                    time.sleep((next_frame - now()) / 1000)
+            # start at ~10 fps, and adapt the rate to keep latency under 200ms and CPU under 80%
+            def print_decision(d):
+                if d['fps'] != d['prev_fps']:
+                    print('Rate %.1f -> %.1f fps (%s: %d ms, %d%% CPU)' % (d['prev_fps'], d['fps'], d['reason'], d['latency_ms'], d['cpu_percent']))
+            governor = RateGovernor(latency_slo_ms=200, cpu_budget=80, start_fps=10, on_decision=print_decision)
 
+            for res, img in runner.classifier(videoCaptureDeviceId, governor=governor):
                 # print('classification runner response', res)
 
                 if "classification" in res["result"].keys():
@@ -115,12 +125,13 @@ def main(argv):
                         print('\t%s (%.2f): x=%d y=%d w=%d h=%d' % (bb['label'], bb['value'], bb['x'], bb['y'], bb['width'], bb['height']))
                         img = cv2.rectangle(img, (bb['x'], bb['y']), (bb['x'] + bb['width'], bb['y'] + bb['height']), (255, 0, 0), 1)
 
+                if (preview):
+                    preview.update(img, res)
+
                 if (show_camera):
                     cv2.imshow('edgeimpulse', cv2.cvtColor(img, cv2.COLOR_RGB2BGR))
                     if cv2.waitKey(1) == ord('q'):
                         break
-
-                next_frame = now() + 100
         finally:
             if (runner):
                 runner.stop()
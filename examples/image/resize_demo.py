@@ -4,19 +4,14 @@ from edge_impulse_linux.image import get_features_from_image_with_studio_mode
 
 
 def create_test_image(frame_buffer_cols, frame_buffer_rows):
-    # Create an empty image with 3 channels (RGB)
-    image_rgb888_packed = np.zeros((frame_buffer_rows, frame_buffer_cols, 3), dtype=np.uint8)
-
-    for row in range(frame_buffer_rows):
-        for col in range(frame_buffer_cols):
-            # Change color a bit (light -> dark from top->down, so we know if the image looks good quickly)
-            blue_intensity = int((255.0 / frame_buffer_rows) * row)
-            green_intensity = int((255.0 / frame_buffer_cols) * col)
+    # Change color a bit (light -> dark from top->down, so we know if the image looks good quickly)
+    blue_intensity = ((255.0 / frame_buffer_rows) * np.arange(frame_buffer_rows)).astype(np.uint8)
+    green_intensity = ((255.0 / frame_buffer_cols) * np.arange(frame_buffer_cols)).astype(np.uint8)
 
-            # Set the pixel values
-            image_rgb888_packed[row, col, 0] = blue_intensity  # Blue channel
-            image_rgb888_packed[row, col, 1] = green_intensity  # Green channel
-            image_rgb888_packed[row, col, 2] = 0  # Red channel is zero for test
+    # Create an image with 3 channels (RGB), red channel is zero for test
+    image_rgb888_packed = np.zeros((frame_buffer_rows, frame_buffer_cols, 3), dtype=np.uint8)
+    image_rgb888_packed[:, :, 0] = blue_intensity[:, None]  # Blue channel
+    image_rgb888_packed[:, :, 1] = green_intensity[None, :]  # Green channel
 
     return image_rgb888_packed
 
@@ -5,43 +5,35 @@ import time
 import threading
 import queue
 from edge_impulse_linux.image import ImageImpulseRunner
-
-def save_frame(file_path, frame, quality=80):
-    """Encode the frame to JPEG and save it to disk."""
-    ret, jpeg = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
-    if ret:
-        try:
-            with open(file_path, "wb") as f:
-                f.write(jpeg.tobytes())
-        except Exception as e:
-            print(f"Error writing {file_path}: {e}")
-    else:
-        print(f"Failed to encode frame for {file_path}.")
-
-def get_latest_frame(q):
-    """Extract and return the last available frame from the queue."""
-    latest = None
-    while not q.empty():
-        try:
-            latest = q.get_nowait()
-        except queue.Empty:
-            break
-    return latest
+from compositor import RoiCompositor
+from edge_impulse_linux.detections import clip_boxes
+from edge_impulse_linux.preview import PreviewServer
+from edge_impulse_linux.shm import SharedFramePublisher
 
 class Classificator(threading.Thread):
     """
-    Thread that retrieves raw frames and coords, generates a blurred version in-process,
-    runs classification on each bbox, and composites the final image.
+    Thread that retrieves matched raw frames and coords from the synchronizer, runs
+    classification on each bbox, and composites the final image by blurring only the
+    bboxes classified as green. Debug images are only produced when DEBUG is set.
+    Pass bgr=False when the frames are RGB (the GStreamer receiver).
     """
-    def __init__(self, raw_queue, coords_queue, config):
+    def __init__(self, sync, writer, config, bgr=True):
         super().__init__(daemon=True)
-        self.raw_queue         = raw_queue
-        self.coords_queue      = coords_queue
+        self.sync              = sync
+        self.writer            = writer
         self.config            = config
+        self.bgr               = bgr
         self.active_image_path = config.ACTIVE_IMAGE_PATH
         self.coords_debug_path = config.COORDS_DEBUG_PATH
         self.process_delay     = config.PROCESS_DELAY
         self.blur_kernel_size = config.BLUR_KERNEL_SIZE
+        self.compositor       = RoiCompositor(self.blur_kernel_size)
+        self.preview          = None
+        if config.PREVIEW_PORT:
+            self.preview = PreviewServer(config.PREVIEW_PORT, host=config.PREVIEW_HOST,
+                                         fps=config.PREVIEW_FPS, bgr=bgr).start()
+        self.publisher        = None    # created on the first frame, once the frame size is known
+        self.stopped          = threading.Event()
 
           # Initialize the Edge Impulse model
         if config.MODE == "NVIDIA":
@@ -53,72 +45,114 @@ class Classificator(threading.Thread):
 
 
     def classify_image(self, image):
-        """Preprocess and classify with Edge Impulse."""
-        gray    = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        resized = cv2.resize(gray, (96, 96))
-        return self.runner.classify(resized.flatten().tolist())
-
-    def generate_blur(self, raw, bboxes):
-        """Apply Gaussian blur over each bbox on a copy of the raw frame."""
-        out = raw.copy()
-        k   = self.blur_kernel_size
+        """Preprocess a crop the way the model was trained (input size, channels,
+        resize mode reported by the runner) and classify with Edge Impulse."""
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) if self.bgr else image
+        if self.runner.resizeMode == 'not-reported':
+            features, _ = self.runner.get_features_from_image(rgb)
+        else:
+            features, _ = self.runner.get_features_from_image_auto_studio_settings(rgb)
+        return self.runner.classify(features)
+
+    def write_debug_frames(self, raw, bboxes):
+        """Queue the all-bboxes-blurred and bbox-outline debug images."""
+        release = self.compositor.release
+
+        # don't composite images the writer would drop anyway
+        if self.writer.wants(self.config.BLUR_DEBUG_PATH):
+            blurred = self.compositor.compose(raw, bboxes)
+            if self.writer.submit(self.config.BLUR_DEBUG_PATH, blurred, release):
+                print(f"[DEBUG] Blurred JPEG → {self.config.BLUR_DEBUG_PATH}")
+
+        if self.writer.wants(self.coords_debug_path):
+            dbg = self.compositor.compose(raw, [])
+            for x1, y1, x2, y2 in bboxes:
+                cv2.rectangle(dbg, (x1, y1), (x2, y2), (0,255,0), 2)
+            if self.writer.submit(self.coords_debug_path, dbg, release):
+                print(f"[DEBUG] BBoxes JPEG → {self.config.COORDS_DEBUG_PATH}")
+
+    def process(self, raw, coords):
+        """Classify the bboxes of one frame and queue the composite."""
+        # UDP frames arrive still JPEG-encoded, decode only the ones we use
+        if hasattr(raw, 'decode'):
+            raw = raw.decode()
+            if raw is None:
+                print("Frame was overwritten or failed to decode, skipping.")
+                return
+
+        # the preview replaces polling the JPEG files, skip writing them while someone watches
+        if self.preview:
+            self.writer.paused = self.config.PREVIEW_SKIP_FILES and self.preview.clients > 0
+
+        # list of tuples (UDP/JSON) or (N, 4) array (GStreamer), clipped to the frame
+        bboxes = clip_boxes(coords.get('bboxes', []), raw.shape[1], raw.shape[0]).tolist()
+
+        if self.config.DEBUG:
+            self.write_debug_frames(raw, bboxes)
+
+        # Classify every bbox on the raw frame, then blur only the green ones
+        selected = []
+        results  = []
         for x1, y1, x2, y2 in bboxes:
-            roi = raw[y1:y2, x1:x2]
-            if roi.size == 0:
+            crop = raw[y1:y2, x1:x2]
+            if crop.size == 0:
                 continue
-            out[y1:y2, x1:x2] = cv2.GaussianBlur(roi, (k, k), 0)
-        return out
+
+            t0     = time.time()
+            res    = self.classify_image(crop)
+            t_ms   = (time.time() - t0) * 1000
+            cls    = res.get("result", {}).get("classification", {})
+            g, r   = cls.get("green",0), cls.get("red",0)
+            label  = "green" if g >= r+0.5 else "red"
+            conf   = cls.get(label,0)
+
+            print(f"Classification: {label.upper()} – Confidence: {conf:.2f}, Time: {t_ms:.0f} ms")
+            results.append({'bbox': [x1, y1, x2, y2], 'label': label, 'confidence': conf})
+
+            if label=="green":
+                selected.append((x1, y1, x2, y2))
+
+        final = self.compositor.compose(raw, selected)
+        if self.config.SHM_NAME:
+            try:
+                if self.publisher is None:
+                    self.publisher = SharedFramePublisher(self.config.SHM_NAME, final.shape,
+                                                          slots=self.config.SHM_SLOTS)
+                self.publisher.publish(final, {'detections': results})
+            except Exception:
+                # the composite came from the pool, hand it back before giving up on this frame
+                self.compositor.release(final)
+                raise
+        if self.preview and self.preview.clients:
+            # the composite goes back to the pool after writing, the preview gets its own copy
+            self.preview.update(final.copy())
+        if self.writer.submit(self.active_image_path, final, self.compositor.release):
+            print(f"Queued composite frame for {self.config.ACTIVE_IMAGE_PATH}")
+        if self.config.DEBUG:
+            print(f"[DEBUG] Active JPEG → {self.config.ACTIVE_IMAGE_PATH}")
+
+    def stop(self):
+        """Stop the thread, then remove the shared memory segment and stop the model."""
+        self.stopped.set()
+        self.join(timeout=5)
+        if self.preview:
+            self.preview.stop()
+        if self.publisher:
+            self.publisher.close()
+            self.publisher = None
+        self.runner.stop()
 
     def run(self):
-        while True:
+        while not self.stopped.is_set():
             try:
-                coords = self.coords_queue.get(timeout=1)
-                raw    = get_latest_frame(self.raw_queue)
-                if raw is None:
-                    continue
-
-                # Generate blur in-process for both modes
-                blurred = self.generate_blur(raw, coords.get('bboxes', []))
-                save_frame(self.config.BLUR_DEBUG_PATH, blurred)
-                if self.config.DEBUG:
-                    print(f"[DEBUG] Blurred JPEG → {self.config.BLUR_DEBUG_PATH}")
-
-                # Draw debug bboxes
-                dbg = raw.copy()
-                for x1, y1, x2, y2 in coords.get('bboxes', []):
-                    cv2.rectangle(dbg, (x1, y1), (x2, y2), (0,255,0), 2)
-                save_frame(self.coords_debug_path, dbg)
-                if self.config.DEBUG:
-                    print(f"[DEBUG] BBoxes JPEG → {self.config.COORDS_DEBUG_PATH}")
-
-                # Composite based on classification
-                final = raw.copy()
-                for x1, y1, x2, y2 in coords.get('bboxes', []):
-                    crop = raw[y1:y2, x1:x2]
-                    if crop.size == 0:
-                        continue
-
-                    t0     = time.time()
-                    res    = self.classify_image(crop)
-                    t_ms   = (time.time() - t0) * 1000
-                    cls    = res.get("result", {}).get("classification", {})
-                    g, r   = cls.get("green",0), cls.get("red",0)
-                    label  = "green" if g >= r+0.5 else "red"
-                    conf   = cls.get(label,0)
-
-                    print(f"Classification: {label.upper()} – Confidence: {conf:.2f}, Time: {t_ms:.0f} ms")
-
-                    if label=="green":
-                        roi = blurred[y1:y2, x1:x2]
-                        if roi.shape==crop.shape:
-                            final[y1:y2, x1:x2] = roi
-
-                save_frame(self.active_image_path, final)
-                print(f"Saved composite frame to {self.config.ACTIVE_IMAGE_PATH}")
-                if self.config.DEBUG:
-                    print(f"[DEBUG] Active JPEG → {self.config.ACTIVE_IMAGE_PATH}")
-
-            except (queue.Empty, threading.BrokenBarrierError):
+                raw, coords = self.sync.get(timeout=1)
+                try:
+                    self.process(raw, coords)
+                finally:
+                    # pooled frames go back once we're done with them
+                    self.sync.release(raw)
+
+            except queue.Empty:
                 continue
             except Exception as e:
                 print("Exception in classificator:", e)
@@ -0,0 +1,46 @@
+# compositor.py
+
+import cv2
+import numpy as np
+from edge_impulse_linux.frame_pool import FramePool
+from edge_impulse_linux.detections import clip_boxes
+
+class RoiCompositor:
+    """
+    Builds the output frame with a single copy of the raw frame into a pooled buffer,
+    then blurs only the selected ROIs in place. Call release() (or hand release to the
+    AsyncFrameWriter) once the output frame is no longer needed.
+    """
+    def __init__(self, blur_kernel_size, pool_size=6):
+        self.blur_kernel_size = blur_kernel_size
+        self.pool_size        = pool_size
+        self.pool             = None
+
+    def acquire(self, raw):
+        """Return a pooled buffer with the same shape as raw, allocating one if the pool is empty."""
+        if self.pool is None or not self.pool.matches(raw.shape, raw.dtype):
+            self.pool = FramePool(raw.shape, raw.dtype, self.pool_size)
+        out = self.pool.acquire()
+        if out is None:
+            out = np.empty_like(raw)
+        return out
+
+    def release(self, frame):
+        if self.pool is not None:
+            self.pool.release(frame)
+
+    def blur_rois(self, frame, bboxes):
+        """Gaussian-blur each (x1, y1, x2, y2) of frame in place, bboxes may be a list or an (N, 4) array."""
+        k = self.blur_kernel_size
+        for x1, y1, x2, y2 in clip_boxes(bboxes, frame.shape[1], frame.shape[0]).tolist():
+            roi = frame[y1:y2, x1:x2]
+            if roi.size == 0:
+                continue
+            cv2.GaussianBlur(roi, (k, k), 0, dst=roi)
+        return frame
+
+    def compose(self, raw, bboxes):
+        """Copy raw once into a pooled buffer and blur the given bboxes in it."""
+        out = self.acquire(raw)
+        np.copyto(out, raw)
+        return self.blur_rois(out, bboxes)
@@ -27,8 +27,23 @@ class Config:
         # General Section
         self.PROCESS_DELAY  = self.parser.getfloat("General", "PROCESS_DELAY")
         self.QUEUE_MAX_SIZE = self.parser.getint("General", "QUEUE_MAX_SIZE")
+        self.SYNC_KEY       = self.parser.get("General", "SYNC_KEY", fallback="arrival")
+        self.SYNC_TOLERANCE = self.parser.getfloat("General", "SYNC_TOLERANCE")
+        self.MIN_CONFIDENCE = self.parser.getint("General", "MIN_CONFIDENCE")
+        self.WRITE_MAX_FPS    = self.parser.getfloat("General", "WRITE_MAX_FPS")
+        self.WRITE_QUEUE_SIZE = self.parser.getint("General", "WRITE_QUEUE_SIZE")
         self.DEBUG          = self.parser.getboolean("General", "DEBUG")
 
+        # Output Section
+        self.SHM_NAME  = self.parser.get("Output", "SHM_NAME")
+        self.SHM_SLOTS = self.parser.getint("Output", "SHM_SLOTS")
+
+        # Preview Section
+        self.PREVIEW_PORT = self.parser.getint("Preview", "PORT")
+        self.PREVIEW_HOST = self.parser.get("Preview", "HOST")
+        self.PREVIEW_FPS  = self.parser.getfloat("Preview", "FPS")
+        self.PREVIEW_SKIP_FILES = self.parser.getboolean("Preview", "SKIP_FILES_WHILE_WATCHED", fallback=True)
+
         # Device Section
         self.MODE = self.parser.get("Device", "MODE").upper()
         self.BLUR_KERNEL_SIZE = self.parser.getint("General", "BLUR_KERNEL_SIZE")
@@ -0,0 +1,99 @@
+# frame_sync.py
+
+import collections
+import queue
+import threading
+
+class FrameSynchronizer:
+    """
+    Pairs frames with their metadata by key (sequence number, PTS or arrival time, in the
+    same unit on both sides). Keeps a small key-ordered buffer of recent frames, matches
+    metadata within `tolerance`, and counts late or unmatched items. add_frame() and
+    add_meta() never block, so the receive threads are never stalled.
+
+    For pooled frames pass retain/release: the synchronizer owns the reference handed
+    to add_frame(), takes an extra one for every pair it returns from get(), and the
+    consumer gives that back with release(frame) when done.
+    """
+    def __init__(self, max_frames=8, tolerance=0.0, max_pending_meta=8, max_ready=2,
+                 retain=None, release=None):
+        self.max_frames       = max_frames
+        self.tolerance        = tolerance
+        self.max_pending_meta = max_pending_meta
+        self._retain          = retain
+        self._release         = release
+        self._cond    = threading.Condition()
+        self._frames  = collections.deque()   # (key, frame, matched), oldest first
+        self._pending = collections.deque()   # (key, meta) waiting for their frame
+        self._ready   = collections.deque(maxlen=max_ready)
+        self.stats = {
+            'matched': 0,           # metadata paired with a frame
+            'late_meta': 0,         # metadata older than every buffered frame
+            'unmatched_meta': 0,    # metadata whose frame never showed up
+            'unmatched_frames': 0,  # frames evicted without any metadata
+            'dropped_pairs': 0,     # pairs overwritten before the consumer took them
+        }
+
+    def add_frame(self, key, frame):
+        with self._cond:
+            self._frames.append([key, frame, False])
+            while len(self._frames) > self.max_frames:
+                _, old_frame, matched = self._frames.popleft()
+                if not matched:
+                    self.stats['unmatched_frames'] += 1
+                self.release(old_frame)
+
+            # metadata that arrived before its frame
+            still_pending = collections.deque()
+            for meta_key, meta in self._pending:
+                if not self._match(meta_key, meta):
+                    if meta_key < self._frames[0][0] - self.tolerance:
+                        self.stats['unmatched_meta'] += 1
+                    else:
+                        still_pending.append((meta_key, meta))
+            self._pending = still_pending
+
+    def add_meta(self, key, meta):
+        with self._cond:
+            if self._match(key, meta):
+                return
+            if self._frames and key < self._frames[0][0] - self.tolerance:
+                self.stats['late_meta'] += 1
+                return
+            self._pending.append((key, meta))
+            while len(self._pending) > self.max_pending_meta:
+                self._pending.popleft()
+                self.stats['unmatched_meta'] += 1
+
+    def _match(self, key, meta):
+        """Pair meta with the closest buffered frame within tolerance, lock must be held."""
+        best = None
+        for entry in self._frames:
+            distance = abs(entry[0] - key)
+            if distance <= self.tolerance and (best is None or distance < abs(best[0] - key)):
+                best = entry
+        if best is None:
+            return False
+
+        best[2] = True
+        if self._retain:
+            self._retain(best[1])
+        if len(self._ready) == self._ready.maxlen:
+            self.stats['dropped_pairs'] += 1
+            self.release(self._ready[0][0])
+        self._ready.append((best[1], meta))
+        self.stats['matched'] += 1
+        self._cond.notify()
+        return True
+
+    def release(self, frame):
+        """Give back a frame returned by get()."""
+        if self._release:
+            self._release(frame)
+
+    def get(self, timeout=None):
+        """Return the oldest matched (frame, meta) pair, raises queue.Empty on timeout."""
+        with self._cond:
+            if not self._ready and not self._cond.wait_for(lambda: self._ready, timeout):
+                raise queue.Empty
+            return self._ready.popleft()
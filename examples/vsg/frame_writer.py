@@ -0,0 +1,113 @@
+# frame_writer.py
+
+import os
+import threading
+import time
+import cv2
+import numpy as np
+
+def save_frame(file_path, frame, quality=80, bgr=True):
+    """Encode the frame to JPEG (unless it already is JPEG bytes) and save it atomically (temp file + rename).
+    Pass bgr=False for RGB frames."""
+    if isinstance(frame, (bytes, bytearray)):
+        jpeg = np.frombuffer(frame, np.uint8)
+    else:
+        if not bgr and frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        ret, jpeg = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        if not ret:
+            print(f"Failed to encode frame for {file_path}.")
+            return False
+    tmp_path = f"{file_path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(jpeg.tobytes())
+        os.replace(tmp_path, file_path)
+        return True
+    except Exception as e:
+        print(f"Error writing {file_path}: {e}")
+        return False
+
+class AsyncFrameWriter(threading.Thread):
+    """
+    Background JPEG writer. submit() only stores a reference and returns immediately;
+    frames for the same path are coalesced (latest wins), every path is written at most
+    `max_fps` times per second, and new paths are dropped once `max_pending` paths are
+    waiting. Frames must not be modified after they are submitted; pass `release` to get
+    pooled frames back once the writer is done with them (written, coalesced or dropped).
+    Frames are BGR, pass bgr=False when the receivers deliver RGB frames. While `paused`
+    is set every submitted frame is dropped (and released) without being written.
+    """
+    def __init__(self, max_fps=2.0, max_pending=4, quality=80, bgr=True):
+        super().__init__(daemon=True)
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.max_pending  = max_pending
+        self.quality      = quality
+        self.bgr          = bgr
+        self.paused       = False
+        self._cond        = threading.Condition()
+        self._pending     = {}   # path -> (latest frame, release)
+        self._last_write  = {}   # path -> time of last write
+        self.stats = {'written': 0, 'coalesced': 0, 'dropped': 0, 'failed': 0, 'paused': 0}
+
+    def wants(self, file_path):
+        """
+        True if a frame for file_path would be queued now, rather than replace a frame
+        that is still waiting for that path or be dropped. Check this before doing any
+        work (copying, compositing) to produce a frame that is only needed for writing.
+        """
+        with self._cond:
+            if self.paused or file_path in self._pending:
+                return False
+            return len(self._pending) < self.max_pending
+
+    def submit(self, file_path, frame, release=None):
+        """Queue a frame for file_path, returns False if it was dropped."""
+        replaced = None
+        with self._cond:
+            if self.paused:
+                self.stats['paused'] += 1
+                if release:
+                    release(frame)
+                return False
+            if file_path in self._pending:
+                self.stats['coalesced'] += 1
+                replaced = self._pending[file_path]
+            elif len(self._pending) >= self.max_pending:
+                self.stats['dropped'] += 1
+                if release:
+                    release(frame)
+                return False
+            self._pending[file_path] = (frame, release)
+            self._cond.notify()
+
+        if replaced and replaced[1]:
+            replaced[1](replaced[0])
+        return True
+
+    def _next_due(self, now):
+        """Return (path, wait) for the pending path that may be written first."""
+        best_path, best_wait = None, None
+        for path in self._pending:
+            wait = self._last_write.get(path, 0.0) + self.min_interval - now
+            if best_wait is None or wait < best_wait:
+                best_path, best_wait = path, wait
+        return best_path, best_wait
+
+    def run(self):
+        while True:
+            with self._cond:
+                while True:
+                    path, wait = self._next_due(time.monotonic())
+                    if path is not None and wait <= 0:
+                        break
+                    self._cond.wait(timeout=wait)
+                frame, release = self._pending.pop(path)
+                self._last_write[path] = time.monotonic()
+
+            if save_frame(path, frame, self.quality, self.bgr):
+                self.stats['written'] += 1
+            else:
+                self.stats['failed'] += 1
+            if release:
+                release(frame)
@@ -1,80 +1,53 @@
 # gst_receivers.py
 
-import gi, threading, queue, struct
+import gi, threading
 import numpy as np
-from udp_receivers import save_frame
+from edge_impulse_linux.detections import decode_detections, DETECTION_COUNT_DTYPE, X1
+from edge_impulse_linux.gst import AppSinkAdapter, sample_clock_time
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst, GLib
 
-class Detection:
-    """Parses a single detection struct from bytes."""
-    _det_struct_pat = "B4H"
-    byte_size = struct.Struct(_det_struct_pat).size
-
-    def __init__(self, data):
-        self.confidence, self.x1, self.y1, self.x2, self.y2 = struct.unpack(self._det_struct_pat, data)
-
-class FrameMetadata:
-    """Parses frame‐level metadata containing multiple Detection entries."""
-    _count_struct = "H"
-    det_count_byte_size = struct.Struct(_count_struct).size
-
-    def __init__(self, data):
-        # First two bytes = object count
-        self.object_count = struct.unpack(self._count_struct, data[:self.det_count_byte_size])[0]
-        self.objects = []
-        offset = self.det_count_byte_size
-        for _ in range(self.object_count):
-            if offset + Detection.byte_size <= len(data):
-                chunk = data[offset:offset + Detection.byte_size]
-                self.objects.append(Detection(chunk))
-                offset += Detection.byte_size
-            else:
-                break
+def launch(desc):
+    """
+    Both receivers run their own pipeline. Giving them the same clock makes the
+    synchronizer keys (base time + running time, see sample_clock_time) comparable,
+    whenever each pipeline went to PLAYING.
+    """
+    pipeline = Gst.parse_launch(desc)
+    pipeline.use_clock(Gst.SystemClock.obtain())
+    return pipeline
 
 class VideoReceiver(threading.Thread):
     """
-    Receives video frames via GStreamer, saves a debug image,
-    and puts the frame into the provided queue.
+    Receives video frames via GStreamer into pooled buffers, queues a debug image
+    on the writer, and hands the frame to the synchronizer keyed by clock time.
+    The synchronizer must be created with retain/release going to this receiver.
+    The pipeline converts to RGB, so frames are RGB (see BGR).
     """
-    def __init__(self, config, raw_queue, barrier):
+    BGR = False
+
+    def __init__(self, config, sync, writer, pool_size=16):
         super().__init__(daemon=True)
         self.config    = config
-        self.raw_queue = raw_queue
-        self.barrier   = barrier
-
-    def on_new_sample(self, appsink):
-        sample = appsink.emit("pull-sample")
-        if not sample:
-            return Gst.FlowReturn.ERROR
-
-        buf  = sample.get_buffer()
-        caps = sample.get_caps().get_structure(0)
-        w    = caps.get_value('width')
-        h    = caps.get_value('height')
-
-        success, info = buf.map(Gst.MapFlags.READ)
-        if not success:
-            return Gst.FlowReturn.ERROR
-
-        frame = np.frombuffer(info.data, dtype=np.uint8).reshape((h, w, 3))
-        buf.unmap(info)
-
-        # save debug JPEG
-        save_frame(self.config.RAW_DEBUG_PATH, frame)
-        if self.config.DEBUG:
+        self.sync      = sync
+        self.writer    = writer
+        self.pool_size = pool_size
+        self.adapter   = None
+
+    def retain(self, frame):
+        return self.adapter.retain(frame)
+
+    def release(self, frame):
+        if self.adapter is not None:
+            self.adapter.release(frame)
+
+    def on_frame(self, frame, key):
+        # save debug JPEG, the writer holds its own reference to the pooled frame
+        self.adapter.retain(frame)
+        if self.writer.submit(self.config.RAW_DEBUG_PATH, frame, self.adapter.release) and self.config.DEBUG:
             print(f"[DEBUG] Raw JPEG → {self.config.RAW_DEBUG_PATH}")
 
-        if self.raw_queue.full():
-            self.raw_queue.get_nowait()
-        self.raw_queue.put(frame)
-
-        try:
-            self.barrier.wait(timeout=1)
-        except:
-            pass
-
-        return Gst.FlowReturn.OK
+        self.sync.add_frame(key, frame)
 
     def run(self):
         Gst.init(None)
@@ -83,22 +56,21 @@ class VideoReceiver(threading.Thread):
             'encoding-name=H264, payload=96" ! rtph264depay ! avdec_h264 ! videoconvert ! '
             'video/x-raw, format=RGB ! appsink name=video_sink emit-signals=true max-buffers=1 drop=true'
         )
-        pipeline = Gst.parse_launch(video_desc)
+        pipeline = launch(video_desc)
         sink     = pipeline.get_by_name("video_sink")
-        sink.connect("new-sample", self.on_new_sample)
+        self.adapter = AppSinkAdapter(sink, self.on_frame, pool_size=self.pool_size)
 
         pipeline.set_state(Gst.State.PLAYING)
         GLib.MainLoop().run()
 
 class MetaReceiver(threading.Thread):
     """
-    Receives metadata via GStreamer, parses bboxes, and puts them into the coords queue.
+    Receives metadata via GStreamer, parses bboxes, and hands them to the synchronizer keyed by clock time.
     """
-    def __init__(self, config, coords_queue, barrier):
+    def __init__(self, config, sync):
         super().__init__(daemon=True)
-        self.config       = config
-        self.coords_queue = coords_queue
-        self.barrier      = barrier
+        self.config = config
+        self.sync   = sync
 
     def on_new_meta_sample(self, appsink):
         sample = appsink.emit("pull-sample")
@@ -110,22 +82,16 @@ class MetaReceiver(threading.Thread):
         if not success:
             return Gst.FlowReturn.ERROR
 
-        # COPY the bytes before unmapping
-        data = bytes(info.data)
-        buf.unmap(info)
-
-        if len(data) >= FrameMetadata.det_count_byte_size:
-            meta   = FrameMetadata(data)
-            bboxes = [(o.x1, o.y1, o.x2, o.y2) for o in meta.objects]
-
-            if self.coords_queue.full():
-                self.coords_queue.get_nowait()
-            self.coords_queue.put({'bboxes': bboxes})
+        # decode_detections copies the records out before unmapping
+        key = sample_clock_time(sample, appsink)
+        if len(info.data) >= DETECTION_COUNT_DTYPE.itemsize:
+            detections = decode_detections(info.data, min_confidence=self.config.MIN_CONFIDENCE)
+            buf.unmap(info)
 
-            try:
-                self.barrier.wait(timeout=1)
-            except:
-                pass
+            # (N, 4) array of x1, y1, x2, y2
+            self.sync.add_meta(key, {'bboxes': detections[:, X1:], 'detections': detections})
+        else:
+            buf.unmap(info)
 
         return Gst.FlowReturn.OK
 
@@ -136,7 +102,7 @@ class MetaReceiver(threading.Thread):
             'caps="application/x-meta, media=meta" ! '
             'appsink name=meta_sink emit-signals=true max-buffers=1 drop=true'
         )
-        pipeline = Gst.parse_launch(meta_desc)
+        pipeline = launch(meta_desc)
         sink     = pipeline.get_by_name("meta_sink")
         sink.connect("new-sample", self.on_new_meta_sample)
 
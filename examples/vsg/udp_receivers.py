@@ -1,62 +1,189 @@
 # udp_receivers.py
 
 import socket
+import struct
 import threading
 import cv2
 import numpy as np
 import time
 import queue
+import json
 
-def save_frame(file_path, frame, quality=80):
-    """Encode the frame to JPEG and save it to disk."""
-    ret, jpeg = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
-    if ret:
-        try:
-            with open(file_path, "wb") as f:
-                f.write(jpeg.tobytes())
-        except Exception as e:
-            print(f"Error writing {file_path}: {e}")
-    else:
-        print(f"Failed to encode frame for {file_path}.")
+# Chunked frame protocol: every datagram starts with this header, followed by
+# the bytes of the JPEG starting at `offset`. Datagrams without the magic are
+# treated as a complete JPEG on their own.
+FRAME_MAGIC  = b'EIFR'
+CHUNK_HEADER = struct.Struct('!4sIIHH')   # magic, frame id, byte offset, chunk index, chunk count
+
+SYNC_KEYS = ('arrival', 'frame_id')
+
+def check_sync_key(sync_key):
+    if sync_key not in SYNC_KEYS:
+        raise Exception('Invalid sync key ' + str(sync_key) + ', should be one of ' + ', '.join(SYNC_KEYS))
+    return sync_key
+
+class FrameSlot:
+    """Preallocated reassembly buffer, reused for every Nth frame."""
+    def __init__(self, max_frame_size):
+        self.buffer     = bytearray(max_frame_size)
+        self.view       = memoryview(self.buffer)
+        self.generation = 0
+
+class EncodedFrame:
+    """
+    A received JPEG that is only decoded when a consumer pulls it. It points into a
+    reassembly slot; once the slot has been reused for a newer frame, jpeg() and
+    decode() return None.
+    """
+    def __init__(self, slot, length):
+        self._slot       = slot
+        self._generation = slot.generation
+        self.length      = length
+
+    def jpeg(self):
+        if self._slot.generation != self._generation:
+            return None
+        return self._slot.view[:self.length]
+
+    def decode(self):
+        data = self.jpeg()
+        if data is None:
+            return None
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        # the receiver may have reused the slot while we were decoding from it
+        if self._slot.generation != self._generation:
+            return None
+        return img
 
 class FrameReceiver(threading.Thread):
     """
-    Receives JPEG frames via UDP, saves a debug image,
-    and puts frames into the provided queue.
+    Receives JPEG frames via UDP, either one per datagram or split into chunks
+    (see CHUNK_HEADER), reassembles them into a ring of preallocated slots with
+    recv_into, and hands undecoded EncodedFrames to the synchronizer. With
+    sync_key='arrival' frames are keyed by the time their last datagram was
+    received, with sync_key='frame_id' by the frame id of the chunk header
+    (frames sent without one are counted as unkeyed and skipped). Lost or
+    incomplete frames are counted in stats. Frames are decoded with
+    cv2.imdecode, so they are BGR (see BGR).
     """
-    def __init__(self, ip, port, frame_queue, debug_path, barrier,
-                 process_delay=0.01, buffer_size=65535, debug=False):
+    BGR = True
+
+    def __init__(self, ip, port, sync, writer, debug_path,
+                 process_delay=0.01, buffer_size=65535, debug=False,
+                 max_frame_size=2 * 1024 * 1024, slots=12, sync_key='arrival'):
         super().__init__(daemon=True)
         self.ip            = ip
         self.port          = port
-        self.frame_queue   = frame_queue
+        self.sync          = sync
+        self.writer        = writer
         self.debug_path    = debug_path
-        self.barrier       = barrier
         self.process_delay = process_delay
         self.buffer_size   = buffer_size
         self.debug         = debug
+        self.sync_key      = check_sync_key(sync_key)
+
+        self.datagram   = bytearray(buffer_size)
+        self.slots      = [FrameSlot(max_frame_size) for _ in range(slots)]
+        self.slot_ix    = 0
+        self.received   = bytearray(65536)     # per-chunk flags of the frame being assembled
+        self.no_chunks  = bytes(65536)
+        self.frame_id   = None
+        self.chunks     = 0
+        self.length     = 0
+        self.complete   = True
+        self.stats = {'frames': 0, 'lost_frames': 0, 'incomplete_frames': 0,
+                      'late_chunks': 0, 'oversized': 0, 'unkeyed': 0}
 
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
         self.sock.bind((self.ip, self.port))
         self.sock.settimeout(1.0)
 
+    def next_slot(self):
+        self.slot_ix = (self.slot_ix + 1) % len(self.slots)
+        slot = self.slots[self.slot_ix]
+        slot.generation += 1
+        return slot
+
+    def add_chunk(self, view):
+        """Copy one chunk into the current slot, returns an EncodedFrame once complete."""
+        _, frame_id, offset, index, count = CHUNK_HEADER.unpack_from(view)
+        payload = view[CHUNK_HEADER.size:]
+
+        if self.frame_id != frame_id:
+            delta = (frame_id - self.frame_id) & 0xffffffff if self.frame_id is not None else 1
+            if delta >= 0x80000000:
+                self.stats['late_chunks'] += 1
+                return None
+            if not self.complete:
+                self.stats['incomplete_frames'] += 1
+            self.stats['lost_frames'] += delta - 1
+            self.frame_id = frame_id
+            self.chunks   = 0
+            self.length   = 0
+            self.complete = False
+            self.received[:count] = self.no_chunks[:count]
+            self.next_slot()
+        elif self.complete or self.received[index]:
+            return None
+
+        slot = self.slots[self.slot_ix]
+        end  = offset + len(payload)
+        if end > len(slot.buffer) or index >= count:
+            self.stats['oversized'] += 1
+            return None
+
+        slot.view[offset:end] = payload
+        self.received[index] = 1
+        self.chunks += 1
+        self.length  = max(self.length, end)
+        if self.chunks < count:
+            return None
+
+        self.complete = True
+        return EncodedFrame(slot, self.length)
+
+    def add_datagram(self, view):
+        """A datagram without a chunk header is a complete JPEG."""
+        slot = self.next_slot()
+        if len(view) > len(slot.buffer):
+            self.stats['oversized'] += 1
+            return None
+        slot.view[:len(view)] = view
+        return EncodedFrame(slot, len(view))
+
     def run(self):
         print(f"Listening for raw frames on port {self.port}...")
+        datagram = memoryview(self.datagram)
         while True:
             try:
-                data, _ = self.sock.recvfrom(self.buffer_size)
-                frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
-                if frame is not None:
-                    save_frame(self.debug_path, frame)
-                    if self.debug:
-                        print(f"[DEBUG] Raw JPEG → {self.debug_path}")
-                    if self.frame_queue.full():
-                        self.frame_queue.get_nowait()
-                    self.frame_queue.put(frame)
-                    self.barrier.wait(timeout=1)
+                n       = self.sock.recv_into(self.datagram)
+                arrived = time.monotonic()
+                view    = datagram[:n]
+                chunked = n >= CHUNK_HEADER.size and view[:4] == FRAME_MAGIC
+                if chunked:
+                    frame = self.add_chunk(view)
+                else:
+                    frame = self.add_datagram(view)
+                if frame is None:
+                    continue    # more chunks to come, don't throttle mid-frame
+
+                if self.sync_key == 'arrival':
+                    key = arrived
+                elif chunked:
+                    key = self.frame_id
                 else:
-                    print("Failed to decode raw frame.")
-            except (socket.timeout, threading.BrokenBarrierError):
+                    self.stats['unkeyed'] += 1
+                    continue
+
+                self.stats['frames'] += 1
+                # only copy the JPEG out of its slot when the writer will take it
+                if self.writer.wants(self.debug_path):
+                    jpeg = frame.jpeg()
+                    if jpeg is not None and self.writer.submit(self.debug_path, bytes(jpeg)) and self.debug:
+                        print(f"[DEBUG] Raw JPEG → {self.debug_path}")
+                self.sync.add_frame(key, frame)
+            except socket.timeout:
                 pass
             except Exception as e:
                 print(f"Exception in raw receiver: {e}")
@@ -64,17 +191,22 @@ class FrameReceiver(threading.Thread):
 
 class CoordsReceiver(threading.Thread):
     """
-    Receives coordinate data (JSON) via UDP and puts it into the provided queue.
+    Receives coordinate data (JSON) via UDP and hands it to the synchronizer.
+    Must use the same sync_key as the FrameReceiver: with 'arrival' coords are
+    keyed by the time they were received, with 'frame_id' by their "frame_id"
+    field, which must hold the id of the frame's chunk header (coords without it
+    are counted as unkeyed and skipped).
     """
-    def __init__(self, ip, port, coords_queue, barrier,
-                 process_delay=0.01, buffer_size=65535):
+    def __init__(self, ip, port, sync,
+                 process_delay=0.01, buffer_size=65535, sync_key='arrival'):
         super().__init__(daemon=True)
         self.ip            = ip
         self.port          = port
-        self.coords_queue  = coords_queue
-        self.barrier       = barrier
+        self.sync          = sync
         self.process_delay = process_delay
         self.buffer_size   = buffer_size
+        self.sync_key      = check_sync_key(sync_key)
+        self.stats         = {'coords': 0, 'unkeyed': 0}
 
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.bind((self.ip, self.port))
@@ -85,12 +217,16 @@ class CoordsReceiver(threading.Thread):
         while True:
             try:
                 data, _ = self.sock.recvfrom(self.buffer_size)
-                coords = __import__('json').loads(data.decode('utf-8'))
-                if self.coords_queue.full():
-                    self.coords_queue.get_nowait()
-                self.coords_queue.put(coords)
-                self.barrier.wait(timeout=1)
-            except (socket.timeout, threading.BrokenBarrierError):
+                key     = time.monotonic()
+                coords  = json.loads(data.decode('utf-8'))
+                if self.sync_key == 'frame_id':
+                    if 'frame_id' not in coords:
+                        self.stats['unkeyed'] += 1
+                        continue
+                    key = int(coords['frame_id'])
+                self.stats['coords'] += 1
+                self.sync.add_meta(key, coords)
+            except socket.timeout:
                 pass
             except Exception as e:
                 print(f"Exception in coords receiver: {e}")
@@ -1,68 +1,91 @@
 # main.py
 
-import threading
-import queue
 import time
 
 from config_parser import Config
 from classifier_worker import Classificator
+from frame_sync import FrameSynchronizer
+from frame_writer import AsyncFrameWriter
 
 def main():
     config = Config()
 
-    # Create queues
-    raw_queue    = queue.Queue(maxsize=config.QUEUE_MAX_SIZE)
-    coords_queue = queue.Queue(maxsize=config.QUEUE_MAX_SIZE)
+    # UDP frames are decoded by OpenCV (BGR), the GStreamer pipeline delivers RGB
+    if config.MODE == "NVIDIA":
+        from udp_receivers import FrameReceiver, CoordsReceiver
+        bgr = FrameReceiver.BGR
+    else:
+        from gst_receivers import VideoReceiver, MetaReceiver
+        bgr = VideoReceiver.BGR
 
-    # Synchronization barrier
-    parties = 2  # raw + coords only
-    barrier  = threading.Barrier(parties=parties)
+    # Encodes and writes the debug / active JPEGs off the hot path
+    writer = AsyncFrameWriter(
+        max_fps=config.WRITE_MAX_FPS,
+        max_pending=config.WRITE_QUEUE_SIZE,
+        bgr=bgr
+    )
+    writer.start()
 
     if config.MODE == "NVIDIA":
-        # Use UDP receivers
-        from udp_receivers import FrameReceiver, CoordsReceiver
+        # Pairs frames with coords by arrival time or frame id (SYNC_KEY)
+        sync = FrameSynchronizer(
+            max_frames=config.QUEUE_MAX_SIZE,
+            tolerance=config.SYNC_TOLERANCE,
+            max_pending_meta=config.QUEUE_MAX_SIZE
+        )
 
+        # Use UDP receivers
         raw_recv = FrameReceiver(
             ip=config.UDP_IP, port=config.UDP_PORT_RAW,
-            frame_queue=raw_queue,
+            sync=sync,
+            writer=writer,
             debug_path=config.RAW_DEBUG_PATH,
-            barrier=barrier,
             process_delay=config.PROCESS_DELAY,
-            debug=config.DEBUG
+            debug=config.DEBUG,
+            slots=config.QUEUE_MAX_SIZE + 2,
+            sync_key=config.SYNC_KEY
         )
         raw_recv.start()
 
         coords_recv = CoordsReceiver(
             ip=config.UDP_IP, port=config.UDP_PORT_COORDS,
-            coords_queue=coords_queue,
-            barrier=barrier,
-            process_delay=config.PROCESS_DELAY
+            sync=sync,
+            process_delay=config.PROCESS_DELAY,
+            sync_key=config.SYNC_KEY
         )
         coords_recv.start()
 
     else:
         # Use GStreamer receivers
-        from gst_receivers import VideoReceiver, MetaReceiver
-
+        # Frames live in a fixed pool: synchronizer buffer, consumer, writer and one spare
+        pool_size = config.QUEUE_MAX_SIZE + config.WRITE_QUEUE_SIZE + 4
+        sync = FrameSynchronizer(
+            max_frames=config.QUEUE_MAX_SIZE,
+            tolerance=config.SYNC_TOLERANCE,
+            max_pending_meta=config.QUEUE_MAX_SIZE,
+            retain=lambda frame: vid_recv.retain(frame),
+            release=lambda frame: vid_recv.release(frame)
+        )
         vid_recv = VideoReceiver(
             config=config,
-            raw_queue=raw_queue,
-            barrier=barrier
+            sync=sync,
+            writer=writer,
+            pool_size=pool_size
         )
         vid_recv.start()
 
         meta_recv = MetaReceiver(
             config=config,
-            coords_queue=coords_queue,
-            barrier=barrier
+            sync=sync
         )
         meta_recv.start()
 
     # Start classification thread
     classifier = Classificator(
-        raw_queue=raw_queue,
-        coords_queue=coords_queue,
-        config=config
+        sync=sync,
+        writer=writer,
+        config=config,
+        bgr=bgr
     )
     classifier.start()
 
@@ -72,6 +95,7 @@ def main():
             time.sleep(1)
     except KeyboardInterrupt:
         print("Terminating...")
+        classifier.stop()
 
 if __name__ == "__main__":
     main()